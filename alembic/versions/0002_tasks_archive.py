@@ -0,0 +1,55 @@
+"""tasks archive and hot-set index
+
+Revision ID: 0002_tasks_archive
+Revises: 0001_init
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_tasks_archive"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_tasks_user_id_is_done_id",
+        "tasks",
+        ["user_id", "is_done", "id"],
+    )
+
+    op.create_table(
+        "tasks_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.Text(), nullable=False),
+        sa.Column(
+            "is_done",
+            sa.Boolean(),
+            server_default=sa.text("true"),
+            nullable=False,
+        ),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column(
+            "archived_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_tasks_archive_user_id", "tasks_archive", ["user_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_archive_user_id", table_name="tasks_archive")
+    op.drop_table("tasks_archive")
+    op.drop_index("ix_tasks_user_id_is_done_id", table_name="tasks")
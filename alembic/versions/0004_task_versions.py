@@ -0,0 +1,42 @@
+"""per-row task versions
+
+Revision ID: 0004_task_versions
+Revises: 0003_idempotency_keys
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_task_versions"
+down_revision = "0003_idempotency_keys"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "tasks",
+        sa.Column(
+            "version",
+            sa.Integer(),
+            server_default=sa.text("1"),
+            nullable=False,
+        ),
+    )
+    op.add_column(
+        "tasks_archive",
+        sa.Column(
+            "version",
+            sa.Integer(),
+            server_default=sa.text("1"),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("tasks_archive", "version")
+    op.drop_column("tasks", "version")
@@ -0,0 +1,27 @@
+"""user task shard placement
+
+Revision ID: 0005_user_task_shard
+Revises: 0004_task_versions
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005_user_task_shard"
+down_revision = "0004_task_versions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("task_shard", sa.Integer(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "task_shard")
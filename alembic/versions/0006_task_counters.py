@@ -0,0 +1,61 @@
+"""per-user task counters
+
+Revision ID: 0006_task_counters
+Revises: 0005_user_task_shard
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006_task_counters"
+down_revision = "0005_user_task_shard"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_counters",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "open_count",
+            sa.Integer(),
+            server_default=sa.text("0"),
+            nullable=False,
+        ),
+        sa.Column(
+            "done_count",
+            sa.Integer(),
+            server_default=sa.text("0"),
+            nullable=False,
+        ),
+        sa.Column(
+            "archived_count",
+            sa.Integer(),
+            server_default=sa.text("0"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.execute(
+        """
+        INSERT INTO task_counters (user_id, open_count, done_count, archived_count)
+        SELECT
+            users.id,
+            (SELECT count(*) FROM tasks
+             WHERE tasks.user_id = users.id AND NOT tasks.is_done),
+            (SELECT count(*) FROM tasks
+             WHERE tasks.user_id = users.id AND tasks.is_done),
+            (SELECT count(*) FROM tasks_archive
+             WHERE tasks_archive.user_id = users.id)
+        FROM users
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("task_counters")
@@ -0,0 +1,94 @@
+"""add binary session token digest (expand)
+
+Revision ID: 0007_binary_token_hash
+Revises: 0006_task_counters
+Create Date: 2026-10-19 00:00:00.000000
+
+Adds sessions.token_digest (32 raw bytes) next to the hex token_hash and
+fills it in id-range batches, each committed on its own. Both columns stay:
+the application writes both and looks sessions up by either, so old and
+new code can run side by side during a rolling deploy. Rows written by old
+code during the backfill only have the hex hash and are still found
+through it. The hex column is dropped by the contract migration 0011,
+once no old code is left and the remaining digests are filled.
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007_binary_token_hash"
+down_revision = "0006_task_counters"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10_000
+
+
+def _max_session_id() -> int:
+    return op.get_bind().execute(
+        sa.text("SELECT coalesce(max(id), 0) FROM sessions")
+    ).scalar_one()
+
+
+def _fill_range(low: int, high: int) -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        bind.execute(
+            sa.text(
+                "UPDATE sessions SET token_digest = decode(token_hash, 'hex') "
+                "WHERE id > :low AND id <= :high AND token_digest IS NULL"
+            ),
+            {"low": low, "high": high},
+        )
+        return
+    rows = bind.execute(
+        sa.text(
+            "SELECT id, token_hash FROM sessions "
+            "WHERE id > :low AND id <= :high AND token_digest IS NULL"
+        ),
+        {"low": low, "high": high},
+    ).all()
+    if rows:
+        bind.execute(
+            sa.text("UPDATE sessions SET token_digest = :value WHERE id = :id"),
+            [
+                {"id": session_id, "value": bytes.fromhex(token_hash)}
+                for session_id, token_hash in rows
+            ],
+        )
+
+
+def upgrade() -> None:
+    op.add_column(
+        "sessions",
+        sa.Column("token_digest", sa.LargeBinary(length=32), nullable=True),
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(
+                "ix_sessions_token_digest",
+                "sessions",
+                ["token_digest"],
+                unique=True,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+    else:
+        op.create_index(
+            "ix_sessions_token_digest",
+            "sessions",
+            ["token_digest"],
+            unique=True,
+        )
+
+    with op.get_context().autocommit_block():
+        for low in range(0, _max_session_id(), BATCH_SIZE):
+            _fill_range(low, low + BATCH_SIZE)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sessions_token_digest", table_name="sessions")
+    with op.batch_alter_table("sessions") as batch_op:
+        batch_op.drop_column("token_digest")
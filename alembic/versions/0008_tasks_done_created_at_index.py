@@ -0,0 +1,40 @@
+"""partial index for the archiver
+
+Revision ID: 0008_tasks_done_created_at_index
+Revises: 0007_binary_token_hash
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008_tasks_done_created_at_index"
+down_revision = "0007_binary_token_hash"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(
+                "ix_tasks_done_created_at",
+                "tasks",
+                ["created_at", "id"],
+                postgresql_where=sa.text("is_done = true"),
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        return
+    op.create_index(
+        "ix_tasks_done_created_at",
+        "tasks",
+        ["created_at", "id"],
+        sqlite_where=sa.text("is_done = 1"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_done_created_at", table_name="tasks")
@@ -0,0 +1,86 @@
+"""archive tasks by completion time
+
+Revision ID: 0009_task_done_at
+Revises: 0008_tasks_done_created_at_index
+Create Date: 2026-10-19 00:00:00.000000
+
+Adds tasks.done_at, set when a task is marked done, and moves the
+archiver's partial index from created_at to it. Tasks that are already
+done get the migration time, so none of them is archived earlier than
+TASKS_ARCHIVE_AFTER_SECONDS after the deploy.
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009_task_done_at"
+down_revision = "0008_tasks_done_created_at_index"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10_000
+
+
+def _create_index(name: str, column: str) -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(
+                name,
+                "tasks",
+                [column, "id"],
+                postgresql_where=sa.text("is_done = true"),
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        return
+    op.create_index(
+        name,
+        "tasks",
+        [column, "id"],
+        sqlite_where=sa.text("is_done = 1"),
+    )
+
+
+def _drop_index(name: str) -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index(
+                name,
+                table_name="tasks",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+        return
+    op.drop_index(name, table_name="tasks")
+
+
+def upgrade() -> None:
+    op.add_column(
+        "tasks",
+        sa.Column("done_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    bind = op.get_bind()
+    max_id = bind.execute(
+        sa.text("SELECT coalesce(max(id), 0) FROM tasks")
+    ).scalar_one()
+    with op.get_context().autocommit_block():
+        for low in range(0, max_id, BATCH_SIZE):
+            bind.execute(
+                sa.text(
+                    "UPDATE tasks SET done_at = CURRENT_TIMESTAMP "
+                    "WHERE id > :low AND id <= :high "
+                    "AND is_done AND done_at IS NULL"
+                ),
+                {"low": low, "high": low + BATCH_SIZE},
+            )
+    _create_index("ix_tasks_done_at", "done_at")
+    _drop_index("ix_tasks_done_created_at")
+
+
+def downgrade() -> None:
+    _create_index("ix_tasks_done_created_at", "created_at")
+    _drop_index("ix_tasks_done_at")
+    with op.batch_alter_table("tasks") as batch_op:
+        batch_op.drop_column("done_at")
@@ -0,0 +1,33 @@
+"""fence users while their tasks move between shards
+
+Revision ID: 0010_user_task_shard_moving
+Revises: 0009_task_done_at
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010_user_task_shard_moving"
+down_revision = "0009_task_done_at"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column(
+            "task_shard_moving",
+            sa.Boolean(),
+            nullable=False,
+            server_default=sa.false(),
+        ),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("task_shard_moving")
@@ -0,0 +1,126 @@
+"""drop hex session token hash (contract)
+
+Revision ID: 0011_drop_hex_token_hash
+Revises: 0010_user_task_shard_moving
+Create Date: 2026-10-19 00:00:00.000000
+
+Second half of 0007. Run it only after every instance runs code that
+writes token_digest, because this code no longer writes or reads the
+hex column. Digests still missing (sessions written by old code during
+the rollout) are filled in batches, token_digest becomes NOT NULL, and
+token_hash goes away together with uq_sessions_token_hash. On PostgreSQL
+NOT NULL is proven by a validated CHECK constraint first, so SET NOT
+NULL skips the table scan under ACCESS EXCLUSIVE.
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011_drop_hex_token_hash"
+down_revision = "0010_user_task_shard_moving"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10_000
+
+def _max_session_id() -> int:
+    return op.get_bind().execute(
+        sa.text("SELECT coalesce(max(id), 0) FROM sessions")
+    ).scalar_one()
+
+
+def _fill_digests(low: int, high: int) -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        bind.execute(
+            sa.text(
+                "UPDATE sessions SET token_digest = decode(token_hash, 'hex') "
+                "WHERE id > :low AND id <= :high AND token_digest IS NULL"
+            ),
+            {"low": low, "high": high},
+        )
+        return
+    rows = bind.execute(
+        sa.text(
+            "SELECT id, token_hash FROM sessions "
+            "WHERE id > :low AND id <= :high AND token_digest IS NULL"
+        ),
+        {"low": low, "high": high},
+    ).all()
+    if rows:
+        bind.execute(
+            sa.text("UPDATE sessions SET token_digest = :value WHERE id = :id"),
+            [
+                {"id": session_id, "value": bytes.fromhex(token_hash)}
+                for session_id, token_hash in rows
+            ],
+        )
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for low in range(0, _max_session_id(), BATCH_SIZE):
+            _fill_digests(low, low + BATCH_SIZE)
+
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "ALTER TABLE sessions ADD CONSTRAINT ck_sessions_token_digest "
+            "CHECK (token_digest IS NOT NULL) NOT VALID"
+        )
+        op.execute(
+            "ALTER TABLE sessions VALIDATE CONSTRAINT ck_sessions_token_digest"
+        )
+        op.alter_column("sessions", "token_digest", nullable=False)
+        op.drop_constraint(
+            "ck_sessions_token_digest", "sessions", type_="check"
+        )
+        op.drop_constraint(
+            "uq_sessions_token_hash", "sessions", type_="unique"
+        )
+        op.drop_column("sessions", "token_hash")
+        return
+
+    with op.batch_alter_table("sessions") as batch_op:
+        batch_op.alter_column(
+            "token_digest",
+            existing_type=sa.LargeBinary(length=32),
+            nullable=False,
+        )
+        batch_op.drop_constraint("uq_sessions_token_hash", type_="unique")
+        batch_op.drop_column("token_hash")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "sessions",
+        sa.Column("token_hash", sa.String(length=64), nullable=True),
+    )
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("UPDATE sessions SET token_hash = encode(token_digest, 'hex')")
+    else:
+        rows = bind.execute(
+            sa.text("SELECT id, token_digest FROM sessions")
+        ).all()
+        if rows:
+            bind.execute(
+                sa.text("UPDATE sessions SET token_hash = :value WHERE id = :id"),
+                [
+                    {"id": session_id, "value": token_digest.hex()}
+                    for session_id, token_digest in rows
+                ],
+            )
+    with op.batch_alter_table("sessions") as batch_op:
+        batch_op.alter_column(
+            "token_hash", existing_type=sa.String(length=64), nullable=False
+        )
+        batch_op.alter_column(
+            "token_digest",
+            existing_type=sa.LargeBinary(length=32),
+            nullable=True,
+        )
+        batch_op.create_unique_constraint(
+            "uq_sessions_token_hash", ["token_hash"]
+        )
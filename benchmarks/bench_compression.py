@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from api.compression import DEFAULT_LEVELS, available_encoders  # noqa: E402
+
+ROUNDS = 50
+SIZES = (10, 200, 5000)
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 6, 11), "zstd": (1, 3, 9, 19)}
+
+
+def _payload(count: int) -> bytes:
+    tasks = [
+        {"id": i, "title": f"task number {i}", "is_done": i % 3 == 0}
+        for i in range(count)
+    ]
+    return json.dumps(tasks).encode("utf-8")
+
+
+def main() -> None:
+    encoders = available_encoders()
+    print("encoding level tasks raw_bytes ratio us_per_call ns_per_byte")
+    for count in SIZES:
+        body = _payload(count)
+        for encoding, encoder in encoders.items():
+            for level in LEVELS.get(encoding, (DEFAULT_LEVELS[encoding],)):
+                compressed = encoder(body, level)
+                started = time.perf_counter()
+                for _ in range(ROUNDS):
+                    encoder(body, level)
+                elapsed = (time.perf_counter() - started) / ROUNDS
+                print(
+                    f"{encoding} {level} {count} {len(body)} "
+                    f"{len(compressed) / len(body):.3f} "
+                    f"{elapsed * 1e6:.1f} {elapsed * 1e9 / len(body):.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import asyncpg
+
+ROWS = int(os.getenv("BENCH_ROWS", "10000000"))
+LOOKUPS = int(os.getenv("BENCH_LOOKUPS", "10000"))
+BATCH = 100_000
+# column -> (sqlite type, postgres type, postgres expression)
+COLUMNS = {
+    "token_hash": (
+        "TEXT",
+        "varchar(64)",
+        "encode(sha256(g::text::bytea), 'hex')",
+    ),
+    "token_digest": ("BLOB", "bytea", "sha256(g::text::bytea)"),
+}
+# Session layouts as the migrations deploy them, with the columns each one
+# indexes and looks sessions up by: before 0007, 0007 (expand) to 0011,
+# and from 0011 (contract) on.
+LAYOUTS = {
+    "hex": ("token_hash",),
+    "expand": ("token_digest", "token_hash"),
+    "binary": ("token_digest",),
+}
+
+
+def _digest(value: int) -> bytes:
+    return hashlib.sha256(str(value).encode("utf-8")).digest()
+
+
+def _value(column: str, value: int) -> bytes | str:
+    digest = _digest(value)
+    return digest if column == "token_digest" else digest.hex()
+
+
+def _report(layout: str, index_bytes: int, elapsed: float) -> None:
+    print(
+        f"{layout} rows={ROWS} index_mb={index_bytes / 2**20:.1f} "
+        f"lookup_us={elapsed * 1e6 / LOOKUPS:.1f}"
+    )
+
+
+def bench_sqlite() -> None:
+    sample = random.sample(range(1, ROWS + 1), min(LOOKUPS, ROWS))
+    for layout, columns in LAYOUTS.items():
+        with tempfile.TemporaryDirectory() as directory:
+            connection = sqlite3.connect(f"{directory}/bench.db")
+            definitions = ", ".join(
+                f"{column} {COLUMNS[column][0]} NOT NULL" for column in columns
+            )
+            connection.execute(
+                f"CREATE TABLE sessions (id INTEGER PRIMARY KEY, {definitions})"
+            )
+            placeholders = ", ".join("?" for _ in columns)
+            for start in range(1, ROWS + 1, BATCH):
+                connection.executemany(
+                    f"INSERT INTO sessions VALUES (?, {placeholders})",
+                    (
+                        (i, *[_value(column, i) for column in columns])
+                        for i in range(start, min(start + BATCH, ROWS + 1))
+                    ),
+                )
+            connection.commit()
+            page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+            before = connection.execute("PRAGMA page_count").fetchone()[0]
+            for column in columns:
+                connection.execute(
+                    f"CREATE UNIQUE INDEX ix_sessions_{column} "
+                    f"ON sessions ({column})"
+                )
+            connection.commit()
+            after = connection.execute("PRAGMA page_count").fetchone()[0]
+            condition = " OR ".join(f"{column} = ?" for column in columns)
+            keys = [
+                [_value(column, i) for column in columns] for i in sample
+            ]
+            started = time.perf_counter()
+            for key in keys:
+                connection.execute(
+                    f"SELECT id FROM sessions WHERE {condition}", key
+                ).fetchone()
+            elapsed = time.perf_counter() - started
+            connection.close()
+        _report(f"sqlite-{layout}", (after - before) * page_size, elapsed)
+
+
+async def bench_postgres(url: str) -> None:
+    connection = await asyncpg.connect(url.replace("+asyncpg", ""))
+    sample = random.sample(range(1, ROWS + 1), min(LOOKUPS, ROWS))
+    try:
+        for layout, columns in LAYOUTS.items():
+            table = f"bench_sessions_{layout}"
+            definitions = ", ".join(
+                f"{column} {COLUMNS[column][1]} NOT NULL" for column in columns
+            )
+            expressions = ", ".join(COLUMNS[column][2] for column in columns)
+            await connection.execute(f"DROP TABLE IF EXISTS {table}")
+            await connection.execute(
+                f"CREATE UNLOGGED TABLE {table} "
+                f"(id bigint PRIMARY KEY, {definitions})"
+            )
+            await connection.execute(
+                f"INSERT INTO {table} SELECT g, {expressions} "
+                f"FROM generate_series(1, {ROWS}) g"
+            )
+            for column in columns:
+                await connection.execute(
+                    f"CREATE UNIQUE INDEX {table}_{column} "
+                    f"ON {table} ({column})"
+                )
+            await connection.execute(f"ANALYZE {table}")
+            index_bytes = 0
+            for column in columns:
+                index_bytes += await connection.fetchval(
+                    f"SELECT pg_relation_size('{table}_{column}')"
+                )
+            condition = " OR ".join(
+                f"{column} = ${number}"
+                for number, column in enumerate(columns, start=1)
+            )
+            statement = await connection.prepare(
+                f"SELECT id FROM {table} WHERE {condition}"
+            )
+            keys = [
+                [_value(column, i) for column in columns] for i in sample
+            ]
+            started = time.perf_counter()
+            for key in keys:
+                await statement.fetchval(*key)
+            elapsed = time.perf_counter() - started
+            await connection.execute(f"DROP TABLE {table}")
+            _report(f"postgres-{layout}", index_bytes, elapsed)
+    finally:
+        await connection.close()
+
+
+def main() -> None:
+    url = os.getenv("BENCH_POSTGRES_URL")
+    if url:
+        asyncio.run(bench_postgres(url))
+    else:
+        bench_sqlite()
+
+
+if __name__ == "__main__":
+    main()
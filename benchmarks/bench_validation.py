@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from pydantic import TypeAdapter  # noqa: E402
+
+from api.body_limits import JsonArrayItemCounter  # noqa: E402
+from api.schemas import (  # noqa: E402
+    RegisterRequest,
+    TaskList,
+    missing_password_classes,
+)
+
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "200000"))
+TASKS = int(os.getenv("BENCH_TASKS", "1000"))
+PASSWORDS = ["Strong1!", "weakpassword", "ALLUPPER123", "Mixed_case_but_long_99"]
+
+
+def _regex_missing(value: str) -> list[str]:
+    missing = []
+    if not re.search(r"[A-Z]", value):
+        missing.append("one uppercase letter")
+    if not re.search(r"[a-z]", value):
+        missing.append("one lowercase letter")
+    if not re.search(r"\d", value):
+        missing.append("one digit")
+    if not re.search(r"[^A-Za-z0-9]", value):
+        missing.append("one special character")
+    return missing
+
+
+def _report(name: str, operations: int, elapsed: float) -> None:
+    print(
+        f"{name} ops={operations} ops_per_s={operations / elapsed:,.0f} "
+        f"us_per_op={elapsed * 1e6 / operations:.2f}"
+    )
+
+
+def _timed(name: str, operations: int, call) -> None:
+    started = time.perf_counter()
+    call()
+    _report(name, operations, time.perf_counter() - started)
+
+
+def main() -> None:
+    passwords = PASSWORDS * (ITERATIONS // len(PASSWORDS))
+    _timed(
+        "password-regex",
+        len(passwords),
+        lambda: [_regex_missing(value) for value in passwords],
+    )
+    _timed(
+        "password-charset",
+        len(passwords),
+        lambda: [missing_password_classes(value) for value in passwords],
+    )
+
+    payload = {"login": " user_1 ", "password": "Strong1!"}
+    requests = ITERATIONS // 10
+    _timed(
+        "register-request",
+        requests,
+        lambda: [
+            RegisterRequest.model_validate(payload) for _ in range(requests)
+        ],
+    )
+
+    body = json.dumps(
+        [{"title": f"task {i}", "is_done": i % 2 == 0} for i in range(TASKS)]
+    ).encode("utf-8")
+    adapter = TypeAdapter(TaskList)
+    rounds = max(1, ITERATIONS // TASKS)
+    _timed(
+        f"task-list-{TASKS}",
+        rounds,
+        lambda: [adapter.validate_json(body) for _ in range(rounds)],
+    )
+
+    def count_items() -> None:
+        for _ in range(rounds):
+            counter = JsonArrayItemCounter()
+            for start in range(0, len(body), 65536):
+                counter.feed(body[start:start + 65536])
+
+    _timed(f"item-counter-{TASKS}", rounds, count_items)
+
+
+if __name__ == "__main__":
+    main()
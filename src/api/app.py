@@ -1,3 +1,4 @@
+import asyncio
 import os
 import logging
 
@@ -6,8 +7,24 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from api.routes import router
-from repository.database import dispose_engine
+from api.body_limits import BodyLimit, BodyLimitMiddleware
+from api.compression import CompressionMiddleware
+from api.idempotency import (
+    DatabaseIdempotencyStore,
+    IdempotencyMiddleware,
+    MemoryIdempotencyStore,
+)
+from api.load_shedding import LoadShedder, LoadSheddingMiddleware, RouteClass
+from api.routes import AUTH_COOKIE_NAME, router
+from api.schemas import MAX_TASKS_PER_REQUEST
+from repository.database import SessionLocal, dispose_engine
+from repository.jobs import (
+    purge_idempotency_once,
+    run_periodic,
+    start_background_jobs,
+    stop_background_jobs,
+)
+from repository.sharding import shard_router, task_session_factories
 from logging_config import setup_logging
 
 setup_logging()
@@ -22,6 +39,67 @@ def _get_cors_origins() -> list[str]:
     return ["http://localhost:5173", "http://127.0.0.1:5173"]
 
 
+IDEMPOTENCY_STORE = os.getenv("IDEMPOTENCY_STORE", "memory").lower()
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+
+
+def _get_idempotency_store() -> (
+    MemoryIdempotencyStore | DatabaseIdempotencyStore
+):
+    if IDEMPOTENCY_STORE == "db":
+        return DatabaseIdempotencyStore(SessionLocal, IDEMPOTENCY_TTL_SECONDS)
+    return MemoryIdempotencyStore(
+        IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_KEYS
+    )
+
+
+app.add_middleware(
+    IdempotencyMiddleware,
+    store=_get_idempotency_store(),
+    routes=(("POST", "/api/register"), ("POST", "/api/tasks")),
+    credential_cookie=AUTH_COOKIE_NAME,
+)
+
+AUTH_MAX_BODY_BYTES = int(os.getenv("AUTH_MAX_BODY_BYTES", "4096"))
+TASKS_MAX_BODY_BYTES = int(os.getenv("TASKS_MAX_BODY_BYTES", "1048576"))
+
+# Added before the shedder so it runs inside it: requests are shed before
+# their bodies are read, and body reads count against the queue budget.
+app.add_middleware(
+    BodyLimitMiddleware,
+    limits={
+        ("POST", "/api/register"): BodyLimit(AUTH_MAX_BODY_BYTES),
+        ("POST", "/api/login"): BodyLimit(AUTH_MAX_BODY_BYTES),
+        ("POST", "/api/tasks"): BodyLimit(
+            TASKS_MAX_BODY_BYTES, max_items=MAX_TASKS_PER_REQUEST
+        ),
+    },
+)
+
+load_shedder = LoadShedder(
+    capacity=int(os.getenv("LOAD_SHED_CAPACITY", "64")),
+    queue_size=int(os.getenv("LOAD_SHED_QUEUE_SIZE", "256")),
+    classes=[
+        RouteClass("auth", priority=0, concurrency=64, queue_size=256, queue_timeout=1.0),
+        RouteClass("read", priority=1, concurrency=48, queue_size=128, queue_timeout=2.0),
+        RouteClass("login", priority=2, concurrency=8, queue_size=32, queue_timeout=3.0),
+        RouteClass("write", priority=2, concurrency=16, queue_size=64, queue_timeout=3.0),
+    ],
+    routes={
+        ("GET", "/api/me"): "auth",
+        ("POST", "/api/logout"): "auth",
+        ("GET", "/api/tasks"): "read",
+        ("GET", "/api/tasks/summary"): "read",
+        ("POST", "/api/login"): "login",
+        ("POST", "/api/register"): "login",
+        ("POST", "/api/tasks"): "write",
+    },
+)
+
+app.state.load_shedder = load_shedder
+app.add_middleware(LoadSheddingMiddleware, shedder=load_shedder)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=_get_cors_origins(),
@@ -30,8 +108,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+    route_levels={"/api/tasks": {"br": 6, "zstd": 6}},
+    cached_paths=("/api/tasks",),
+)
+
 app.include_router(router)
 
+
 def _sanitize_errors(errors: list[dict]) -> list[dict]:
     sanitized = []
     for error in errors:
@@ -61,6 +147,29 @@ async def validation_exception_handler(
     return JSONResponse(status_code=422, content={"detail": sanitized})
 
 
+_background_jobs: list[asyncio.Task] = []
+
+
+@app.on_event("startup")
+async def on_startup() -> None:
+    _background_jobs.extend(start_background_jobs(task_session_factories()))
+    if IDEMPOTENCY_STORE == "db":
+        _background_jobs.append(
+            asyncio.create_task(
+                run_periodic(
+                    lambda: purge_idempotency_once(
+                        SessionLocal, IDEMPOTENCY_TTL_SECONDS
+                    ),
+                    min(IDEMPOTENCY_TTL_SECONDS, 3600),
+                    "idempotency_purge",
+                )
+            )
+        )
+
+
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
+    await stop_background_jobs(_background_jobs)
+    if shard_router is not None:
+        await shard_router.dispose()
     await dispose_engine()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+_JSON_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+_NOT_BRACKETS = bytes(set(range(256)) - set(b"[]{}"))
+
+
+@dataclass
+class BodyLimit:
+    max_bytes: int
+    max_items: int | None = None
+
+
+class BodyRejectedError(Exception):
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class JsonArrayItemCounter:
+    def __init__(self) -> None:
+        self.depth = 0
+        self.items = 0
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> int:
+        data = self._tail + chunk
+        self._tail = b""
+        if b"\\" in data:
+            data = _JSON_STRING.sub(b"", data)
+            quote = data.find(b'"')
+            if quote >= 0:
+                data, self._tail = data[:quote], data[quote:]
+        else:
+            parts = data.split(b'"')
+            if len(parts) % 2 == 0:
+                self._tail = b'"' + parts.pop()
+            data = b"".join(parts[::2])
+        depth = self.depth
+        items = self.items
+        for bracket in data.translate(None, _NOT_BRACKETS):
+            if bracket == 0x7B:
+                if depth == 1:
+                    items += 1
+                depth += 1
+            elif bracket == 0x5B:
+                depth += 1
+            else:
+                depth -= 1
+        self.depth = depth
+        self.items = items
+        return items
+
+
+async def read_limited_body(receive: Receive, limit: BodyLimit) -> bytes:
+    chunks = []
+    size = 0
+    counter = JsonArrayItemCounter() if limit.max_items is not None else None
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise BodyRejectedError(400, "Client disconnected")
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit.max_bytes:
+            raise BodyRejectedError(413, "Request body is too large")
+        if counter is not None and counter.feed(chunk) > limit.max_items:
+            raise BodyRejectedError(413, "Too many items in request body")
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+class BodyLimitMiddleware:
+    def __init__(
+        self, app: ASGIApp, limits: dict[tuple[str, str], BodyLimit]
+    ) -> None:
+        self.app = app
+        self.limits = limits
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.limits.get((scope["method"], scope["path"]))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            content_length = _content_length(scope)
+            if content_length is not None and content_length > limit.max_bytes:
+                raise BodyRejectedError(413, "Request body is too large")
+            body = await read_limited_body(receive, limit)
+        except BodyRejectedError as exc:
+            response = JSONResponse(
+                status_code=exc.status_code,
+                content={"detail": exc.detail},
+                headers={"Connection": "close"},
+            )
+            await response(scope, receive, send)
+            return
+
+        sent = False
+
+        async def replay() -> Message:
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, replay, send)
+
+
+def _content_length(scope: Scope) -> int | None:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                raise BodyRejectedError(400, "Invalid Content-Length")
+    return None
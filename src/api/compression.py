@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import Callable
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+
+
+def _gzip(data: bytes, level: int) -> bytes:
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _zstd(data: bytes, level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _brotli(data: bytes, level: int) -> bytes:
+    return brotli.compress(data, quality=level)
+
+
+def available_encoders() -> dict[str, Callable[[bytes, int], bytes]]:
+    encoders: dict[str, Callable[[bytes, int], bytes]] = {}
+    if zstandard is not None:
+        encoders["zstd"] = _zstd
+    if brotli is not None:
+        encoders["br"] = _brotli
+    encoders["gzip"] = _gzip
+    return encoders
+
+
+def negotiate_encoding(
+    accept_encoding: str, supported: list[str]
+) -> str | None:
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    wildcard = accepted.get("*", 0.0)
+    best = None
+    best_quality = 0.0
+    for encoding in supported:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        levels: dict[str, int] | None = None,
+        route_levels: dict[str, dict[str, int]] | None = None,
+        cached_paths: tuple[str, ...] = (),
+        cache_size: int = 256,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.route_levels = route_levels or {}
+        self.cached_paths = set(cached_paths)
+        self.cache_size = cache_size
+        self.encoders = available_encoders()
+        self._cache: OrderedDict[tuple[str, int, bytes], bytes] = (
+            OrderedDict()
+        )
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate_encoding(accept, list(self.encoders))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        start: Message | None = None
+        chunks: list[bytes] = []
+        streaming = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, streaming
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if (
+                message["type"] != "http.response.body"
+                or start is None
+                or streaming
+            ):
+                await send(message)
+                return
+            if message.get("more_body", False) and not chunks:
+                # Streaming responses are passed through untouched.
+                streaming = True
+                await send(start)
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self._send_response(
+                send, start, b"".join(chunks), encoding, path
+            )
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_response(
+        self,
+        send: Send,
+        start: Message,
+        body: bytes,
+        encoding: str,
+        path: str,
+    ) -> None:
+        headers = MutableHeaders(raw=list(start["headers"]))
+        if (
+            len(body) < self.minimum_size
+            or "content-encoding" in headers
+            or start["status"] < 200
+            or start["status"] in (204, 304)
+        ):
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        level = self.route_levels.get(path, {}).get(
+            encoding, self.levels[encoding]
+        )
+        compressed = self._compress(body, encoding, level, path)
+        headers["Content-Encoding"] = encoding
+        headers["Content-Length"] = str(len(compressed))
+        headers.add_vary_header("Accept-Encoding")
+        await send({**start, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": compressed})
+
+    def _compress(
+        self, body: bytes, encoding: str, level: int, path: str
+    ) -> bytes:
+        if path not in self.cached_paths:
+            return self.encoders[encoding](body, level)
+        key = (encoding, level, hashlib.sha256(body).digest())
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+        compressed = self.encoders[encoding](body, level)
+        self._cache[key] = compressed
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return compressed
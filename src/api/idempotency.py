@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.datastructures import Headers
+from starlette.requests import cookie_parser
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from repository.crud import (
+    claim_idempotency_key,
+    delete_idempotency_key,
+    get_idempotency_key,
+    save_idempotency_key,
+)
+from repository.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+SKIPPED_HEADERS = {b"set-cookie", b"content-length", b"date", b"server"}
+# Status of a record whose request is still running in another worker.
+PENDING_STATUS = 0
+PENDING_TIMEOUT_SECONDS = 60
+
+
+@dataclass
+class IdempotencyRecord:
+    fingerprint: str
+    status_code: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+
+class MemoryIdempotencyStore:
+    def __init__(self, ttl_seconds: int, max_keys: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self._records: OrderedDict[str, tuple[float, IdempotencyRecord]] = (
+            OrderedDict()
+        )
+
+    async def get(self, key: str) -> IdempotencyRecord | None:
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        expires_at, record = entry
+        if expires_at <= time.monotonic():
+            del self._records[key]
+            return None
+        return record
+
+    async def claim(self, key: str, fingerprint: str) -> bool:
+        return True
+
+    async def release(self, key: str) -> None:
+        pass
+
+    async def put(self, key: str, record: IdempotencyRecord) -> None:
+        self._records[key] = (time.monotonic() + self.ttl_seconds, record)
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_keys:
+            self._records.popitem(last=False)
+
+
+class DatabaseIdempotencyStore:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        ttl_seconds: int,
+    ) -> None:
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+
+    async def get(self, key: str) -> IdempotencyRecord | None:
+        created_after = datetime.now(timezone.utc) - timedelta(
+            seconds=self.ttl_seconds
+        )
+        async with self.session_factory() as session:
+            row = await get_idempotency_key(session, key, created_after)
+        if row is None:
+            return None
+        if row.status_code == PENDING_STATUS:
+            claimed_at = row.created_at
+            if claimed_at.tzinfo is None:
+                claimed_at = claimed_at.replace(tzinfo=timezone.utc)
+            if claimed_at <= datetime.now(timezone.utc) - timedelta(
+                seconds=PENDING_TIMEOUT_SECONDS
+            ):
+                return None
+        return IdempotencyRecord(
+            fingerprint=row.fingerprint,
+            status_code=row.status_code,
+            headers=[
+                (name.encode("latin-1"), value.encode("latin-1"))
+                for name, value in json.loads(row.headers)
+            ],
+            body=row.body,
+        )
+
+    async def claim(self, key: str, fingerprint: str) -> bool:
+        now = datetime.now(timezone.utc)
+        row = IdempotencyKey(
+            key=key,
+            fingerprint=fingerprint,
+            status_code=PENDING_STATUS,
+            headers="[]",
+            body=b"",
+            created_at=now,
+        )
+        async with self.session_factory() as session:
+            return await claim_idempotency_key(
+                session,
+                row,
+                stale_before=now - timedelta(seconds=PENDING_TIMEOUT_SECONDS),
+                expired_before=now - timedelta(seconds=self.ttl_seconds),
+            )
+
+    async def release(self, key: str) -> None:
+        async with self.session_factory() as session:
+            await delete_idempotency_key(session, key)
+
+    async def put(self, key: str, record: IdempotencyRecord) -> None:
+        row = IdempotencyKey(
+            key=key,
+            fingerprint=record.fingerprint,
+            status_code=record.status_code,
+            headers=json.dumps(
+                [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in record.headers
+                ]
+            ),
+            body=record.body,
+            created_at=datetime.now(timezone.utc),
+        )
+        async with self.session_factory() as session:
+            await save_idempotency_key(session, row)
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+def _replay_receive(body: bytes) -> Receive:
+    sent = False
+
+    async def receive() -> Message:
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return receive
+
+
+def _pending_record(fingerprint: str) -> IdempotencyRecord:
+    return IdempotencyRecord(fingerprint, PENDING_STATUS, [], b"")
+
+
+class IdempotencyMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: MemoryIdempotencyStore | DatabaseIdempotencyStore,
+        routes: tuple[tuple[str, str], ...],
+        credential_cookie: str,
+    ) -> None:
+        self.app = app
+        self.store = store
+        self.routes = set(routes)
+        self.credential_cookie = credential_cookie
+        self._inflight: dict[str, asyncio.Future[IdempotencyRecord | None]] = {}
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if (
+            scope["type"] != "http"
+            or (scope["method"], scope["path"]) not in self.routes
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await JSONResponse(
+                status_code=400, content={"detail": "Invalid Idempotency-Key"}
+            )(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        credential = headers.get("authorization") or cookie_parser(
+            headers.get("cookie", "")
+        ).get(self.credential_cookie, "")
+        query_string = scope.get("query_string", b"")
+        fingerprint = hashlib.sha256(
+            scope["method"].encode() + b"\0" + scope["path"].encode()
+            + b"?" + query_string + b"\0" + body
+        ).hexdigest()
+        # Anonymous clients share no credential, so their keys are scoped
+        # to the request itself: equal keys from different clients with
+        # different bodies never meet.
+        owner = credential or fingerprint
+        store_key = hashlib.sha256(
+            f"{scope['method']}\0{scope['path']}\0".encode("utf-8")
+            + query_string
+            + f"\0{owner}\0{idempotency_key}".encode("utf-8")
+        ).hexdigest()
+
+        # Duplicates wait for the request in flight. If it fails there is
+        # nothing to replay, and the first waiter to wake up runs it again
+        # while the others wait for that one.
+        while True:
+            inflight = self._inflight.get(store_key)
+            if inflight is None:
+                record = await self.store.get(store_key)
+                if record is not None:
+                    await self._replay(record, fingerprint, send)
+                    return
+                if store_key in self._inflight:
+                    continue
+                break
+            record = await asyncio.shield(inflight)
+            if record is not None:
+                await self._replay(record, fingerprint, send)
+                return
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[store_key] = future
+        record = None
+        try:
+            if not await self.store.claim(store_key, fingerprint):
+                # Another worker holds the key.
+                record = await self.store.get(store_key)
+                await self._replay(
+                    record or _pending_record(fingerprint), fingerprint, send
+                )
+                return
+            try:
+                record = await self._run(scope, body, fingerprint, send)
+            finally:
+                if record is None:
+                    await self.store.release(store_key)
+            future.set_result(record)
+            await self.store.put(store_key, record)
+        finally:
+            if not future.done():
+                future.set_result(None)
+            if self._inflight.get(store_key) is future:
+                del self._inflight[store_key]
+
+    async def _run(
+        self, scope: Scope, body: bytes, fingerprint: str, send: Send
+    ) -> IdempotencyRecord | None:
+        start: Message = {}
+        chunks: list[bytes] = []
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, _replay_receive(body), send_wrapper)
+        if not start or start["status"] >= 500:
+            return None
+        return IdempotencyRecord(
+            fingerprint=fingerprint,
+            status_code=start["status"],
+            headers=[
+                (name, value)
+                for name, value in start.get("headers", [])
+                if name.lower() not in SKIPPED_HEADERS
+            ],
+            body=b"".join(chunks),
+        )
+
+    async def _replay(
+        self, record: IdempotencyRecord, fingerprint: str, send: Send
+    ) -> None:
+        if record.fingerprint != fingerprint:
+            body = json.dumps(
+                {"detail": "Idempotency-Key reused with a different request"}
+            ).encode("utf-8")
+            status_code = 422
+            headers = [(b"content-type", b"application/json")]
+        elif record.status_code == PENDING_STATUS:
+            body = json.dumps(
+                {"detail": "A request with this Idempotency-Key is in progress"}
+            ).encode("utf-8")
+            status_code = 409
+            headers = [
+                (b"content-type", b"application/json"),
+                (b"retry-after", b"1"),
+            ]
+        else:
+            body = record.body
+            status_code = record.status_code
+            headers = [*record.headers, (b"idempotent-replayed", b"true")]
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [
+                    *headers,
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
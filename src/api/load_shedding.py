@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from dataclasses import dataclass, field
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+EWMA_WEIGHT = 0.2
+
+
+@dataclass
+class RouteClass:
+    name: str
+    priority: int
+    concurrency: int
+    queue_size: int
+    queue_timeout: float
+
+
+class PriorityLimiter:
+    def __init__(self, capacity: int, max_waiters: int) -> None:
+        self.capacity = capacity
+        self.max_waiters = max_waiters
+        self.in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: int, timeout: float) -> bool:
+        if self.in_flight < self.capacity and not self._waiters:
+            self.in_flight += 1
+            return True
+        if len(self._waiters) >= self.max_waiters or timeout <= 0:
+            return False
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._sequence), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait({future}, timeout=timeout)
+        except BaseException:
+            self._abandon(entry)
+            raise
+        if future.done():
+            return True
+        self._abandon(entry)
+        return False
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _abandon(self, entry: tuple[int, int, asyncio.Future[None]]) -> None:
+        future = entry[2]
+        if future.done():
+            self.release()
+            return
+        future.cancel()
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+
+
+@dataclass
+class RouteClassState:
+    route_class: RouteClass
+    limiter: PriorityLimiter
+    service_time: float = 0.0
+    admitted: int = 0
+    shed: dict[str, int] = field(
+        default_factory=lambda: {"queue_full": 0, "deadline": 0, "timeout": 0}
+    )
+
+    def estimated_wait(self) -> float:
+        ahead = self.limiter.queued + 1
+        return ahead * self.service_time / self.route_class.concurrency
+
+
+class LoadShedder:
+    def __init__(
+        self,
+        capacity: int,
+        queue_size: int,
+        classes: list[RouteClass],
+        routes: dict[tuple[str, str], str],
+    ) -> None:
+        self.limiter = PriorityLimiter(capacity, queue_size)
+        self.classes = {
+            route_class.name: RouteClassState(
+                route_class,
+                PriorityLimiter(
+                    route_class.concurrency, route_class.queue_size
+                ),
+            )
+            for route_class in classes
+        }
+        self.routes = routes
+
+    def classify(self, method: str, path: str) -> RouteClassState | None:
+        name = self.routes.get((method, path))
+        if name is None:
+            return None
+        return self.classes[name]
+
+    async def acquire(self, state: RouteClassState) -> float | None:
+        route_class = state.route_class
+        if state.limiter.in_flight >= route_class.concurrency:
+            if state.limiter.queued >= route_class.queue_size:
+                return self._shed(state, "queue_full")
+            estimate = state.estimated_wait()
+            if estimate > route_class.queue_timeout:
+                return self._shed(state, "deadline", estimate)
+
+        deadline = time.monotonic() + route_class.queue_timeout
+        if not await state.limiter.acquire(
+            route_class.priority, route_class.queue_timeout
+        ):
+            return self._shed(state, "timeout")
+        if not await self.limiter.acquire(
+            route_class.priority, deadline - time.monotonic()
+        ):
+            state.limiter.release()
+            return self._shed(state, "timeout")
+        state.admitted += 1
+        return None
+
+    def release(self, state: RouteClassState, elapsed: float) -> None:
+        self.limiter.release()
+        state.limiter.release()
+        state.service_time += EWMA_WEIGHT * (elapsed - state.service_time)
+
+    def _shed(
+        self, state: RouteClassState, reason: str, estimate: float = 0.0
+    ) -> float:
+        state.shed[reason] += 1
+        return max(estimate, state.route_class.queue_timeout)
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": self.limiter.in_flight,
+            "queued": self.limiter.queued,
+            "classes": {
+                name: {
+                    "priority": state.route_class.priority,
+                    "in_flight": state.limiter.in_flight,
+                    "queued": state.limiter.queued,
+                    "admitted": state.admitted,
+                    "shed": dict(state.shed),
+                    "service_time_ms": round(state.service_time * 1000, 3),
+                }
+                for name, state in self.classes.items()
+            },
+        }
+
+
+class LoadSheddingMiddleware:
+    def __init__(self, app: ASGIApp, shedder: LoadShedder) -> None:
+        self.app = app
+        self.shedder = shedder
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        state = self.shedder.classify(scope["method"], scope["path"])
+        if state is None:
+            await self.app(scope, receive, send)
+            return
+        retry_after = await self.shedder.acquire(state)
+        if retry_after is not None:
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is overloaded, retry later"},
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.shedder.release(state, time.monotonic() - started)
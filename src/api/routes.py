@@ -1,5 +1,7 @@
 import logging
 import os
+import secrets
+from typing import AsyncGenerator
 
 from fastapi import (
     APIRouter,
@@ -9,6 +11,7 @@ from fastapi import (
     Response,
     status,
 )
+from fastapi.responses import JSONResponse
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -17,14 +20,18 @@ from api.schemas import (
     LoginRequest,
     RegisterRequest,
     RegisterResponse,
-    TaskIn,
+    TaskConflictResponse,
+    TaskList,
     TaskOut,
+    TaskSummary,
     UserOut,
 )
 from repository.crud import (
+    TaskConflictError,
     create_session,
     create_user,
     get_user_by_login,
+    get_task_counters,
     get_user_by_token,
     list_tasks,
     revoke_session,
@@ -32,6 +39,8 @@ from repository.crud import (
 )
 from repository.database import get_session
 from repository.models import (
+    Task,
+    TaskArchive,
     User,
 )
 from repository.security import (
@@ -40,6 +49,7 @@ from repository.security import (
     normalize_login,
     verify_password,
 )
+from repository.sharding import ShardRouter, get_shard_router
 
 router = APIRouter()
 logger = logging.getLogger("app.auth")
@@ -47,6 +57,7 @@ logger = logging.getLogger("app.auth")
 AUTH_COOKIE_NAME = os.getenv("AUTH_COOKIE_NAME", "auth_token")
 AUTH_COOKIE_SAMESITE = os.getenv("AUTH_COOKIE_SAMESITE", "lax").lower()
 AUTH_COOKIE_DOMAIN = os.getenv("AUTH_COOKIE_DOMAIN") or None
+LOAD_STATS_TOKEN = os.getenv("LOAD_STATS_TOKEN", "")
 
 if AUTH_COOKIE_SAMESITE not in {"lax", "strict", "none"}:
     AUTH_COOKIE_SAMESITE = "lax"
@@ -84,6 +95,15 @@ def _extract_token(
     return None
 
 
+def _task_out(task: Task | TaskArchive) -> TaskOut:
+    return TaskOut(
+        id=task.id,
+        title=task.title,
+        is_done=task.is_done,
+        version=task.version,
+    )
+
+
 async def get_current_user(
     request: Request,
     session: AsyncSession = Depends(get_session),
@@ -98,6 +118,27 @@ async def get_current_user(
     return user
 
 
+async def get_tasks_session(
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+    shard_router: ShardRouter | None = Depends(get_shard_router),
+) -> AsyncGenerator[AsyncSession, None]:
+    if shard_router is None:
+        yield session
+        return
+    # Users served from the token cache carry no placement, so the shard is
+    # always read from the directory (an identity-map hit on a cache miss).
+    user = await session.get(User, current_user.id)
+    if user.task_shard_moving:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Tasks are being moved to another shard",
+            headers={"Retry-After": "1"},
+        )
+    async with shard_router.session_for(user) as tasks_session:
+        yield tasks_session
+
+
 @router.post(
     "/api/register",
     response_model=RegisterResponse,
@@ -193,26 +234,71 @@ async def logout(
 
 @router.get("/api/tasks", response_model=list[TaskOut])
 async def get_tasks(
+    include_archived: bool = False,
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_tasks_session),
 ) -> list[TaskOut]:
-    tasks = await list_tasks(session, current_user.id)
-    return [
-        TaskOut(id=task.id, title=task.title, is_done=task.is_done)
-        for task in tasks
-    ]
+    tasks = await list_tasks(
+        session, current_user.id, include_archived=include_archived
+    )
+    return [_task_out(task) for task in tasks]
 
 
-@router.post("/api/tasks", response_model=list[TaskOut])
-async def post_tasks(
-    tasks: list[TaskIn],
+@router.get("/api/tasks/summary", response_model=TaskSummary)
+async def get_tasks_summary(
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
-) -> list[TaskOut]:
-    tasks = await update_tasks(
-        session, current_user.id, [task.model_dump() for task in tasks]
+    session: AsyncSession = Depends(get_tasks_session),
+) -> TaskSummary:
+    counters = await get_task_counters(session, current_user.id)
+    if counters is None:
+        return TaskSummary(open=0, done=0, archived=0)
+    return TaskSummary(
+        open=counters.open_count,
+        done=counters.done_count,
+        archived=counters.archived_count,
     )
-    return [
-        TaskOut(id=task.id, title=task.title, is_done=task.is_done)
-        for task in tasks
-    ]
+
+
+@router.post(
+    "/api/tasks",
+    response_model=list[TaskOut],
+    responses={status.HTTP_409_CONFLICT: {"model": TaskConflictResponse}},
+)
+async def post_tasks(
+    tasks: TaskList,
+    replace: bool | None = None,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_tasks_session),
+) -> list[TaskOut] | JSONResponse:
+    user_id = current_user.id
+    try:
+        saved = await update_tasks(
+            session,
+            user_id,
+            [task.model_dump() for task in tasks],
+            replace=replace,
+        )
+    except TaskConflictError as exc:
+        logger.info(
+            "tasks conflict",
+            extra={"event": "tasks_conflict", "user_id": user_id},
+        )
+        conflict = TaskConflictResponse(
+            detail="Tasks were changed concurrently",
+            tasks=[_task_out(task) for task in exc.tasks],
+        )
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content=conflict.model_dump(),
+        )
+    return [_task_out(task) for task in saved]
+
+
+@router.get("/api/load", include_in_schema=False)
+async def load_stats(request: Request) -> dict:
+    provided = request.headers.get("x-load-stats-token", "")
+    if not LOAD_STATS_TOKEN or not secrets.compare_digest(
+        provided.encode("utf-8"), LOAD_STATS_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return request.app.state.load_shedder.snapshot()
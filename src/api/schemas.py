@@ -1,36 +1,64 @@
 import re
+import string
+from typing import Annotated
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import (
+    AfterValidator,
+    BaseModel,
+    Field,
+    field_validator,
+    model_validator,
+)
 
 LOGIN_PATTERN = re.compile(r"^[A-Za-z0-9._-]{3,32}$")
+MAX_TASKS_PER_REQUEST = 1000
+MAX_TASK_TITLE_LENGTH = 1000
+
+_UPPERCASE = frozenset(string.ascii_uppercase)
+_LOWERCASE = frozenset(string.ascii_lowercase)
+_DIGITS = frozenset(string.digits)
+_ALPHANUMERIC = _UPPERCASE | _LOWERCASE | _DIGITS
+
+
+def _validate_login(value: str) -> str:
+    trimmed = value.strip()
+    if not LOGIN_PATTERN.fullmatch(trimmed):
+        raise ValueError(
+            "Login must be 3-32 chars: Latin letters, digits, or ._-"
+        )
+    return trimmed
+
+
+def missing_password_classes(value: str) -> list[str]:
+    chars = set(value)
+    special = chars - _ALPHANUMERIC
+    missing = []
+    if chars.isdisjoint(_UPPERCASE):
+        missing.append("one uppercase letter")
+    if chars.isdisjoint(_LOWERCASE):
+        missing.append("one lowercase letter")
+    if chars.isdisjoint(_DIGITS) and not any(
+        char.isdecimal() for char in special
+    ):
+        missing.append("one digit")
+    if not special:
+        missing.append("one special character")
+    return missing
+
+
+Login = Annotated[
+    str, Field(min_length=3, max_length=32), AfterValidator(_validate_login)
+]
 
 
 class RegisterRequest(BaseModel):
-    login: str = Field(min_length=3, max_length=32)
+    login: Login
     password: str = Field(min_length=8, max_length=128)
 
-    @field_validator("login")
-    @classmethod
-    def validate_login(cls, value: str) -> str:
-        trimmed = value.strip()
-        if not LOGIN_PATTERN.fullmatch(trimmed):
-            raise ValueError(
-                "Login must be 3-32 chars: Latin letters, digits, or ._-"
-            )
-        return trimmed
-
     @field_validator("password")
     @classmethod
     def validate_password(cls, value: str) -> str:
-        missing = []
-        if not re.search(r"[A-Z]", value):
-            missing.append("one uppercase letter")
-        if not re.search(r"[a-z]", value):
-            missing.append("one lowercase letter")
-        if not re.search(r"\d", value):
-            missing.append("one digit")
-        if not re.search(r"[^A-Za-z0-9]", value):
-            missing.append("one special character")
+        missing = missing_password_classes(value)
         if missing:
             raise ValueError(
                 "Password must include at least " + ", ".join(missing)
@@ -39,19 +67,9 @@ class RegisterRequest(BaseModel):
 
 
 class LoginRequest(BaseModel):
-    login: str = Field(min_length=3, max_length=32)
+    login: Login
     password: str = Field(min_length=1, max_length=128)
 
-    @field_validator("login")
-    @classmethod
-    def validate_login(cls, value: str) -> str:
-        trimmed = value.strip()
-        if not LOGIN_PATTERN.fullmatch(trimmed):
-            raise ValueError(
-                "Login must be 3-32 chars: Latin letters, digits, or ._-"
-            )
-        return trimmed
-
 
 class UserOut(BaseModel):
     id: int
@@ -70,8 +88,32 @@ class TaskOut(BaseModel):
     id: int
     title: str
     is_done: bool
+    version: int
+
+
+class TaskSummary(BaseModel):
+    open: int
+    done: int
+    archived: int
 
 
 class TaskIn(BaseModel):
-    title: str
+    id: int | None = None
+    version: int | None = None
+    title: str = Field(max_length=MAX_TASK_TITLE_LENGTH)
     is_done: bool
+    deleted: bool = False
+
+    @model_validator(mode="after")
+    def validate_version(self) -> "TaskIn":
+        if self.id is not None and self.version is None:
+            raise ValueError("version is required for existing tasks")
+        return self
+
+
+class TaskConflictResponse(BaseModel):
+    detail: str
+    tasks: list[TaskOut]
+
+
+TaskList = Annotated[list[TaskIn], Field(max_length=MAX_TASKS_PER_REQUEST)]
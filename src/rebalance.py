@@ -0,0 +1,57 @@
+import argparse
+import asyncio
+
+from repository.database import SessionLocal, dispose_engine
+from repository.sharding import (
+    TASK_MOVE_GRACE_SECONDS,
+    move_user_tasks,
+    pin_user_shards,
+    rebalance_users,
+    shard_router,
+)
+
+
+async def main(args: argparse.Namespace) -> None:
+    if shard_router is None:
+        raise SystemExit("TASK_SHARD_URLS is not configured")
+    try:
+        async with SessionLocal() as session:
+            if args.command == "init":
+                await shard_router.create_schema()
+                print("shard schema created")
+            elif args.command == "pin":
+                count = await pin_user_shards(shard_router, session)
+                print(f"pinned {count} users")
+            elif args.command == "move":
+                count = await move_user_tasks(
+                    shard_router, session, args.user_id, args.target, args.grace
+                )
+                print(f"moved {count} tasks")
+            else:
+                count = await rebalance_users(shard_router, session, args.grace)
+                print(f"moved {count} users")
+    finally:
+        await shard_router.dispose()
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="task shards maintenance")
+    parser.add_argument(
+        "--grace",
+        type=float,
+        default=TASK_MOVE_GRACE_SECONDS,
+        help="seconds to wait after fencing a user before copying",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init", help="create tasks tables on every shard")
+    commands.add_parser(
+        "pin", help="pin users to their current shard before adding shards"
+    )
+    move = commands.add_parser("move", help="move one user's tasks")
+    move.add_argument("user_id", type=int)
+    move.add_argument("target", type=int)
+    commands.add_parser(
+        "rebalance", help="move pinned users to their hashed shard"
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -1,14 +1,35 @@
 from __future__ import annotations
 
 import secrets
+from collections import Counter
 from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import delete, func, select
+from sqlalchemy import (
+    and_,
+    delete,
+    func,
+    insert,
+    or_,
+    select,
+    true,
+    union,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from repository.models import AuthSession, Task, User
+from repository.models import (
+    AuthSession,
+    IdempotencyKey,
+    Task,
+    TaskArchive,
+    TaskCounter,
+    User,
+)
 from repository.security import TOKEN_TTL_SECONDS, hash_token
+from repository.token_cache import REVOKED, get_token_cache
 
 
 async def create_user(
@@ -36,13 +57,13 @@ async def get_user_by_login(
 
 async def create_session(session: AsyncSession, user_id: int) -> str:
     token = secrets.token_urlsafe(32)
-    token_hash = hash_token(token)
+    token_digest = hash_token(token)
     expires_at = datetime.now(timezone.utc) + timedelta(
         seconds=TOKEN_TTL_SECONDS
     )
     auth_session = AuthSession(
         user_id=user_id,
-        token_hash=token_hash,
+        token_digest=token_digest,
         expires_at=expires_at,
     )
     session.add(auth_session)
@@ -53,43 +74,495 @@ async def create_session(session: AsyncSession, user_id: int) -> str:
 async def revoke_session(session: AsyncSession, token: str) -> None:
     token_hash = hash_token(token)
     await session.execute(
-        delete(AuthSession).where(AuthSession.token_hash == token_hash)
+        delete(AuthSession).where(AuthSession.token_digest == token_hash)
     )
     await session.commit()
+    cache = get_token_cache()
+    if cache is not None:
+        cache.revoke(token_hash)
 
 
 async def get_user_by_token(
     session: AsyncSession, token: str
 ) -> User | None:
     token_hash = hash_token(token)
+    cache = get_token_cache()
+    if cache is not None:
+        cached = cache.get(token_hash)
+        if cached is REVOKED:
+            return None
+        if cached is not None:
+            return User(id=cached.user_id, login=cached.login)
     stmt = (
-        select(User)
+        select(User, AuthSession.expires_at)
         .join(AuthSession, AuthSession.user_id == User.id)
-        .where(AuthSession.token_hash == token_hash)
+        .where(AuthSession.token_digest == token_hash)
         .where(AuthSession.expires_at > func.now())
     )
-    result = await session.execute(stmt)
-    return result.scalar_one_or_none()
+    row = (await session.execute(stmt)).one_or_none()
+    if row is None:
+        return None
+    user, expires_at = row
+    if cache is not None:
+        cache.put(token_hash, user.id, user.login, expires_at)
+    return user
 
 
-async def list_tasks(session: AsyncSession, user_id: int) -> list[Task]:
+async def list_tasks(
+    session: AsyncSession, user_id: int, include_archived: bool = False
+) -> list[Task | TaskArchive]:
     result = await session.execute(
         select(Task).where(Task.user_id == user_id).order_by(Task.id)
     )
-    return list(result.scalars().all())
+    tasks: list[Task | TaskArchive] = list(result.scalars().all())
+    if include_archived:
+        archived = await session.execute(
+            select(TaskArchive)
+            .where(TaskArchive.user_id == user_id)
+            .order_by(TaskArchive.id)
+        )
+        tasks.extend(archived.scalars().all())
+        tasks.sort(key=lambda task: task.id)
+    return tasks
+
+
+class TaskConflictError(Exception):
+    def __init__(self, tasks: list[Task]) -> None:
+        super().__init__("task version conflict")
+        self.tasks = tasks
 
 
 async def update_tasks(
     session: AsyncSession,
     user_id: int,
-    tasks_dict: list[dict[str, str | bool]],
+    tasks_dict: list[dict[str, str | bool | int | None]],
+    replace: bool | None = None,
 ) -> list[Task]:
+    if replace is None:
+        # Clients from before task versions send the whole list without
+        # ids and expect it to replace what is stored.
+        replace = all(task.get("id") is None for task in tasks_dict)
+    if replace:
+        return await _replace_tasks(session, user_id, tasks_dict)
+    now = datetime.now(timezone.utc)
     try:
-        tasks = [Task(**task, user_id=user_id) for task in tasks_dict]
-        await session.execute(delete(Task).where(user_id == user_id))
-        session.add_all(tasks)
+        result = await session.execute(
+            select(Task.id, Task.title, Task.is_done, Task.version).where(
+                Task.user_id == user_id
+            )
+        )
+        current = {row.id: row for row in result}
+        # Lists loaded with include_archived echo archived rows back:
+        # unchanged ones are skipped, edited ones move back to tasks.
+        unknown = [
+            task["id"]
+            for task in tasks_dict
+            if task.get("id") is not None and task["id"] not in current
+        ]
+        archived = {}
+        if unknown:
+            result = await session.execute(
+                select(
+                    TaskArchive.id,
+                    TaskArchive.title,
+                    TaskArchive.is_done,
+                    TaskArchive.version,
+                    TaskArchive.created_at,
+                )
+                .where(TaskArchive.user_id == user_id)
+                .where(TaskArchive.id.in_(unknown))
+            )
+            archived = {row.id: row for row in result}
+        deltas = {False: 0, True: 0}
+        archived_delta = 0
+        conflict = False
+        new_tasks = []
+        restored = []
+        for task in tasks_dict:
+            task_id = task.get("id")
+            if task_id is None:
+                new_tasks.append(
+                    {
+                        "user_id": user_id,
+                        "title": task["title"],
+                        "is_done": task["is_done"],
+                        "done_at": now if task["is_done"] else None,
+                    }
+                )
+                deltas[task["is_done"]] += 1
+                continue
+            model = TaskArchive if task_id in archived else Task
+            snapshot = archived.get(task_id) or current.get(task_id)
+            if task.get("deleted"):
+                if snapshot is None:
+                    continue
+            elif snapshot is not None and (
+                snapshot.title,
+                snapshot.is_done,
+            ) == (task["title"], task["is_done"]):
+                continue
+            if snapshot is None or snapshot.version != task["version"]:
+                conflict = True
+                break
+            condition = (
+                model.id == task_id,
+                model.user_id == user_id,
+                model.version == task["version"],
+            )
+            if task.get("deleted") or model is TaskArchive:
+                stmt = delete(model).where(*condition)
+            else:
+                values = {
+                    "title": task["title"],
+                    "is_done": task["is_done"],
+                    "version": Task.version + 1,
+                }
+                if task["is_done"] != snapshot.is_done:
+                    values["done_at"] = now if task["is_done"] else None
+                stmt = update(Task).where(*condition).values(**values)
+            changed = await session.execute(
+                stmt.execution_options(synchronize_session=False)
+            )
+            if changed.rowcount != 1:
+                conflict = True
+                break
+            if model is TaskArchive:
+                archived_delta -= 1
+                if not task.get("deleted"):
+                    restored.append(
+                        {
+                            "id": task_id,
+                            "user_id": user_id,
+                            "title": task["title"],
+                            "is_done": task["is_done"],
+                            "version": snapshot.version + 1,
+                            "created_at": snapshot.created_at,
+                            "done_at": now if task["is_done"] else None,
+                        }
+                    )
+            else:
+                deltas[snapshot.is_done] -= 1
+            if not task.get("deleted"):
+                deltas[task["is_done"]] += 1
+        if conflict:
+            await session.rollback()
+            raise TaskConflictError(await list_tasks(session, user_id))
+        if restored:
+            await session.execute(insert(Task), restored)
+        if new_tasks:
+            await session.execute(insert(Task), new_tasks)
+        if deltas[False] or deltas[True] or archived_delta:
+            await _write_task_counters(
+                session,
+                [
+                    {
+                        "user_id": user_id,
+                        "open_count": deltas[False],
+                        "done_count": deltas[True],
+                        "archived_count": archived_delta,
+                    }
+                ],
+                increment=True,
+            )
+        await session.commit()
+    except TaskConflictError:
+        raise
+    except Exception:
+        await session.rollback()
+        raise
+    return await list_tasks(session, user_id)
+
+
+async def _replace_tasks(
+    session: AsyncSession,
+    user_id: int,
+    tasks_dict: list[dict[str, str | bool | int | None]],
+) -> list[Task]:
+    now = datetime.now(timezone.utc)
+    try:
+        result = await session.execute(
+            delete(Task)
+            .where(Task.user_id == user_id)
+            .returning(Task.title, Task.is_done, Task.created_at, Task.done_at)
+            .execution_options(synchronize_session=False)
+        )
+        # A full-list save carries no ids, so tasks that come back with the
+        # same title and state keep their timestamps and still age out.
+        kept: dict[tuple[str, bool], list] = {}
+        for row in result:
+            kept.setdefault((row.title, row.is_done), []).append(row)
+        rows = []
+        for task in tasks_dict:
+            previous = kept.get((task["title"], task["is_done"]))
+            previous = previous.pop(0) if previous else None
+            rows.append(
+                {
+                    "user_id": user_id,
+                    "title": task["title"],
+                    "is_done": task["is_done"],
+                    "created_at": (
+                        previous.created_at if previous is not None else now
+                    ),
+                    "done_at": (
+                        previous.done_at
+                        if previous is not None
+                        else now if task["is_done"] else None
+                    ),
+                }
+            )
+        tasks = []
+        if rows:
+            result = await session.scalars(
+                insert(Task).returning(Task), rows
+            )
+            tasks = sorted(result.all(), key=lambda task: task.id)
+        done = sum(1 for task in tasks if task.is_done)
+        await _write_task_counters(
+            session,
+            [
+                {
+                    "user_id": user_id,
+                    "open_count": len(tasks) - done,
+                    "done_count": done,
+                }
+            ],
+        )
         await session.commit()
     except Exception:
         await session.rollback()
         raise
     return tasks
+
+
+async def _write_task_counters(
+    session: AsyncSession,
+    rows: list[dict[str, int]],
+    increment: bool = False,
+) -> None:
+    if session.get_bind().dialect.name == "postgresql":
+        stmt = postgresql_insert(TaskCounter).values(rows)
+    else:
+        stmt = sqlite_insert(TaskCounter).values(rows)
+    columns = [column for column in rows[0] if column != "user_id"]
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[TaskCounter.user_id],
+            set_={
+                column: (
+                    getattr(TaskCounter, column) + stmt.excluded[column]
+                    if increment
+                    else stmt.excluded[column]
+                )
+                for column in columns
+            },
+        )
+    )
+
+
+async def get_task_counters(
+    session: AsyncSession, user_id: int
+) -> TaskCounter | None:
+    return await session.get(TaskCounter, user_id)
+
+
+async def recount_task_counters(
+    session: AsyncSession, user_ids: list[int]
+) -> None:
+    await session.execute(
+        select(TaskCounter.user_id)
+        .where(TaskCounter.user_id.in_(user_ids))
+        .with_for_update()
+    )
+    counts = {
+        user_id: {
+            "user_id": user_id,
+            "open_count": 0,
+            "done_count": 0,
+            "archived_count": 0,
+        }
+        for user_id in user_ids
+    }
+    hot = await session.execute(
+        select(Task.user_id, Task.is_done, func.count())
+        .where(Task.user_id.in_(user_ids))
+        .group_by(Task.user_id, Task.is_done)
+    )
+    for user_id, is_done, count in hot:
+        counts[user_id]["done_count" if is_done else "open_count"] = count
+    archived = await session.execute(
+        select(TaskArchive.user_id, func.count())
+        .where(TaskArchive.user_id.in_(user_ids))
+        .group_by(TaskArchive.user_id)
+    )
+    for user_id, count in archived:
+        counts[user_id]["archived_count"] = count
+    await _write_task_counters(session, list(counts.values()))
+
+
+async def repair_task_counters(
+    session: AsyncSession, batch_size: int = 500
+) -> int:
+    repaired = 0
+    last_user_id = 0
+    while True:
+        owners = union(
+            *[
+                select(subquery.c.user_id)
+                for subquery in (
+                    select(model.user_id)
+                    .where(model.user_id > last_user_id)
+                    .group_by(model.user_id)
+                    .order_by(model.user_id)
+                    .limit(batch_size)
+                    .subquery()
+                    for model in (Task, TaskArchive, TaskCounter)
+                )
+            ]
+        ).subquery()
+        result = await session.execute(
+            select(owners.c.user_id)
+            .order_by(owners.c.user_id)
+            .limit(batch_size)
+        )
+        user_ids = list(result.scalars().all())
+        if not user_ids:
+            return repaired
+        try:
+            await recount_task_counters(session, user_ids)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        repaired += len(user_ids)
+        last_user_id = user_ids[-1]
+
+
+async def archive_done_tasks(
+    session: AsyncSession, cutoff: datetime, batch_size: int = 500
+) -> int:
+    archived = 0
+    while True:
+        # Archived rows leave tasks, so each batch starts from the task
+        # that was completed first, on the partial index.
+        batch = (
+            select(Task.id)
+            .where(Task.is_done == true())
+            .where(Task.done_at < cutoff)
+            .order_by(Task.done_at, Task.id)
+            .limit(batch_size)
+        )
+        try:
+            result = await session.execute(
+                delete(Task)
+                .where(Task.id.in_(batch.scalar_subquery()))
+                .returning(
+                    Task.id,
+                    Task.user_id,
+                    Task.title,
+                    Task.is_done,
+                    Task.version,
+                    Task.created_at,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            rows = [row._asdict() for row in result.all()]
+            if rows:
+                await session.execute(insert(TaskArchive), rows)
+                moved = Counter(row["user_id"] for row in rows)
+                await _write_task_counters(
+                    session,
+                    [
+                        {
+                            "user_id": user_id,
+                            "done_count": -count,
+                            "archived_count": count,
+                        }
+                        for user_id, count in sorted(moved.items())
+                    ],
+                    increment=True,
+                )
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        archived += len(rows)
+        if len(rows) < batch_size:
+            return archived
+
+
+async def get_idempotency_key(
+    session: AsyncSession, key: str, created_after: datetime
+) -> IdempotencyKey | None:
+    result = await session.execute(
+        select(IdempotencyKey)
+        .where(IdempotencyKey.key == key)
+        .where(IdempotencyKey.created_at > created_after)
+    )
+    return result.scalar_one_or_none()
+
+
+async def claim_idempotency_key(
+    session: AsyncSession,
+    record: IdempotencyKey,
+    stale_before: datetime,
+    expired_before: datetime,
+) -> bool:
+    values = {
+        "key": record.key,
+        "fingerprint": record.fingerprint,
+        "status_code": record.status_code,
+        "headers": record.headers,
+        "body": record.body,
+        "created_at": record.created_at,
+    }
+    if session.get_bind().dialect.name == "postgresql":
+        stmt = postgresql_insert(IdempotencyKey).values(values)
+    else:
+        stmt = sqlite_insert(IdempotencyKey).values(values)
+    # Only pending claims left behind by a crashed worker and expired
+    # responses can be taken over; live ones make the insert a no-op.
+    result = await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key],
+            set_={
+                column: stmt.excluded[column]
+                for column in values
+                if column != "key"
+            },
+            where=or_(
+                and_(
+                    IdempotencyKey.status_code == record.status_code,
+                    IdempotencyKey.created_at <= stale_before,
+                ),
+                IdempotencyKey.created_at <= expired_before,
+            ),
+        )
+    )
+    await session.commit()
+    return result.rowcount == 1
+
+
+async def delete_idempotency_key(session: AsyncSession, key: str) -> None:
+    await session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.key == key)
+    )
+    await session.commit()
+
+
+async def save_idempotency_key(
+    session: AsyncSession, record: IdempotencyKey
+) -> None:
+    await session.merge(record)
+    await session.commit()
+
+
+async def purge_idempotency_keys(
+    session: AsyncSession, created_before: datetime
+) -> int:
+    result = await session.execute(
+        delete(IdempotencyKey).where(
+            IdempotencyKey.created_at <= created_before
+        )
+    )
+    await session.commit()
+    return result.rowcount
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from repository.crud import (
+    archive_done_tasks,
+    purge_idempotency_keys,
+    repair_task_counters,
+)
+
+logger = logging.getLogger("app.jobs")
+
+TASKS_ARCHIVE_AFTER_SECONDS = int(
+    os.getenv("TASKS_ARCHIVE_AFTER_SECONDS", str(60 * 60 * 24 * 30))
+)
+TASKS_ARCHIVE_BATCH_SIZE = int(os.getenv("TASKS_ARCHIVE_BATCH_SIZE", "500"))
+TASKS_ARCHIVE_INTERVAL_SECONDS = int(
+    os.getenv("TASKS_ARCHIVE_INTERVAL_SECONDS", "3600")
+)
+TASK_COUNTERS_REPAIR_BATCH_SIZE = int(
+    os.getenv("TASK_COUNTERS_REPAIR_BATCH_SIZE", "500")
+)
+TASK_COUNTERS_REPAIR_INTERVAL_SECONDS = int(
+    os.getenv("TASK_COUNTERS_REPAIR_INTERVAL_SECONDS", "86400")
+)
+
+
+async def archive_once(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        seconds=TASKS_ARCHIVE_AFTER_SECONDS
+    )
+    async with session_factory() as session:
+        archived = await archive_done_tasks(
+            session, cutoff, batch_size=TASKS_ARCHIVE_BATCH_SIZE
+        )
+    logger.info(
+        "tasks archived",
+        extra={"event": "tasks_archived", "count": archived},
+    )
+    return archived
+
+
+async def repair_counters_once(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> int:
+    async with session_factory() as session:
+        repaired = await repair_task_counters(
+            session, batch_size=TASK_COUNTERS_REPAIR_BATCH_SIZE
+        )
+    logger.info(
+        "task counters repaired",
+        extra={"event": "task_counters_repaired", "count": repaired},
+    )
+    return repaired
+
+
+async def purge_idempotency_once(
+    session_factory: async_sessionmaker[AsyncSession], ttl_seconds: int
+) -> int:
+    created_before = datetime.now(timezone.utc) - timedelta(
+        seconds=ttl_seconds
+    )
+    async with session_factory() as session:
+        return await purge_idempotency_keys(session, created_before)
+
+
+async def run_periodic(
+    job: Callable[[], Awaitable[object]], interval_seconds: int, name: str
+) -> None:
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(
+                "background job failed",
+                extra={"event": "job_failed", "job": name},
+            )
+        await asyncio.sleep(interval_seconds)
+
+
+def start_background_jobs(
+    task_session_factories: list[async_sessionmaker[AsyncSession]],
+) -> list[asyncio.Task]:
+    jobs = []
+    if TASKS_ARCHIVE_INTERVAL_SECONDS > 0:
+        for session_factory in task_session_factories:
+            jobs.append(
+                asyncio.create_task(
+                    run_periodic(
+                        partial(archive_once, session_factory),
+                        TASKS_ARCHIVE_INTERVAL_SECONDS,
+                        "tasks_archive",
+                    )
+                )
+            )
+    if TASK_COUNTERS_REPAIR_INTERVAL_SECONDS > 0:
+        for session_factory in task_session_factories:
+            jobs.append(
+                asyncio.create_task(
+                    run_periodic(
+                        partial(repair_counters_once, session_factory),
+                        TASK_COUNTERS_REPAIR_INTERVAL_SECONDS,
+                        "task_counters_repair",
+                    )
+                )
+            )
+    return jobs
+
+
+async def stop_background_jobs(jobs: list[asyncio.Task]) -> None:
+    for job in jobs:
+        job.cancel()
+    await asyncio.gather(*jobs, return_exceptions=True)
+    jobs.clear()
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+
+from sqlalchemy import (
+    Column,
+    DefaultClause,
+    Index,
+    Table,
+    MetaData,
+    delete,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from repository.database import SessionLocal, _normalize_database_url
+from repository.crud import recount_task_counters
+from repository.models import Task, TaskArchive, TaskCounter, User
+
+TASK_MOVE_GRACE_SECONDS = float(os.getenv("TASK_MOVE_GRACE_SECONDS", "10"))
+
+
+def shard_metadata() -> MetaData:
+    metadata = MetaData()
+    for table in (
+        Task.__table__,
+        TaskArchive.__table__,
+        TaskCounter.__table__,
+    ):
+        shard_table = Table(
+            table.name,
+            metadata,
+            *[
+                Column(
+                    column.name,
+                    column.type,
+                    primary_key=column.primary_key,
+                    autoincrement=column.autoincrement,
+                    nullable=column.nullable,
+                    server_default=(
+                        DefaultClause(column.server_default.arg)
+                        if column.server_default is not None
+                        else None
+                    ),
+                )
+                for column in table.columns
+            ],
+            **table.dialect_kwargs,
+        )
+        for index in table.indexes:
+            Index(
+                index.name,
+                *[shard_table.c[column.name] for column in index.columns],
+                **index.dialect_kwargs,
+            )
+    return metadata
+
+
+class ShardRouter:
+    def __init__(self, urls: list[str]) -> None:
+        if not urls:
+            raise ValueError("At least one shard url is required")
+        self.engines: list[AsyncEngine] = [
+            create_async_engine(_normalize_database_url(url), future=True)
+            for url in urls
+        ]
+        self.session_factories = [
+            async_sessionmaker(engine, expire_on_commit=False)
+            for engine in self.engines
+        ]
+
+    @classmethod
+    def from_env(cls) -> ShardRouter | None:
+        raw = os.getenv("TASK_SHARD_URLS", "")
+        urls = [url.strip() for url in raw.split(",") if url.strip()]
+        if not urls:
+            return None
+        return cls(urls)
+
+    def hash_shard(self, user_id: int) -> int:
+        scores = [
+            hashlib.sha256(f"{user_id}:{index}".encode("utf-8")).digest()
+            for index in range(len(self.engines))
+        ]
+        return max(range(len(scores)), key=scores.__getitem__)
+
+    def shard_for(self, user: User) -> int:
+        if user.task_shard is not None:
+            return user.task_shard
+        return self.hash_shard(user.id)
+
+    def session_for(self, user: User) -> AsyncSession:
+        return self.session_factories[self.shard_for(user)]()
+
+    async def create_schema(self) -> None:
+        metadata = shard_metadata()
+        for engine in self.engines:
+            async with engine.begin() as connection:
+                await connection.run_sync(metadata.create_all)
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
+
+
+shard_router = ShardRouter.from_env()
+
+
+def get_shard_router() -> ShardRouter | None:
+    return shard_router
+
+
+def task_session_factories() -> list[async_sessionmaker[AsyncSession]]:
+    if shard_router is None:
+        return [SessionLocal]
+    return shard_router.session_factories
+
+
+async def move_user_tasks(
+    router: ShardRouter,
+    directory_session: AsyncSession,
+    user_id: int,
+    target: int,
+    grace_seconds: float = TASK_MOVE_GRACE_SECONDS,
+) -> int:
+    user = await directory_session.get(User, user_id)
+    if user is None:
+        raise ValueError(f"Unknown user {user_id}")
+    source = router.shard_for(user)
+    if source == target:
+        if user.task_shard_moving:
+            user.task_shard_moving = False
+            await directory_session.commit()
+        return 0
+
+    # Task requests for a fenced user get 503 until the directory flip;
+    # the grace period lets requests that already picked the source finish.
+    user.task_shard_moving = True
+    await directory_session.commit()
+    await asyncio.sleep(grace_seconds)
+    try:
+        copied = await _copy_user_tasks(router, user_id, source, target)
+    except Exception:
+        user.task_shard_moving = False
+        await directory_session.commit()
+        raise
+
+    user.task_shard = None if target == router.hash_shard(user_id) else target
+    user.task_shard_moving = False
+    await directory_session.commit()
+
+    async with router.session_factories[source]() as source_session:
+        await source_session.execute(
+            delete(Task).where(Task.user_id == user_id)
+        )
+        await source_session.execute(
+            delete(TaskArchive).where(TaskArchive.user_id == user_id)
+        )
+        await source_session.execute(
+            delete(TaskCounter).where(TaskCounter.user_id == user_id)
+        )
+        await source_session.commit()
+    return copied
+
+
+async def _copy_user_tasks(
+    router: ShardRouter, user_id: int, source: int, target: int
+) -> int:
+    async with router.session_factories[source]() as source_session:
+        tasks = (
+            await source_session.execute(
+                select(Task).where(Task.user_id == user_id).order_by(Task.id)
+            )
+        ).scalars().all()
+        archived = (
+            await source_session.execute(
+                select(TaskArchive)
+                .where(TaskArchive.user_id == user_id)
+                .order_by(TaskArchive.id)
+            )
+        ).scalars().all()
+
+    async with router.session_factories[target]() as target_session:
+        try:
+            # Rows left by a move that stopped before the directory flip.
+            await target_session.execute(
+                delete(Task).where(Task.user_id == user_id)
+            )
+            await target_session.execute(
+                delete(TaskArchive).where(TaskArchive.user_id == user_id)
+            )
+            target_session.add_all(
+                Task(
+                    user_id=user_id,
+                    title=task.title,
+                    is_done=task.is_done,
+                    version=task.version,
+                    created_at=task.created_at,
+                    done_at=task.done_at,
+                )
+                for task in tasks
+            )
+            # Archive ids are task ids of the shard that owns them, so
+            # archived rows take fresh ids from the target's tasks sequence.
+            placeholders = [
+                Task(user_id=user_id, title=row.title, is_done=True)
+                for row in archived
+            ]
+            target_session.add_all(placeholders)
+            await target_session.flush()
+            if archived:
+                await target_session.execute(
+                    insert(TaskArchive),
+                    [
+                        {
+                            "id": placeholder.id,
+                            "user_id": user_id,
+                            "title": row.title,
+                            "is_done": row.is_done,
+                            "version": row.version,
+                            "created_at": row.created_at,
+                            "archived_at": row.archived_at,
+                        }
+                        for placeholder, row in zip(placeholders, archived)
+                    ],
+                )
+                await target_session.execute(
+                    delete(Task)
+                    .where(Task.id.in_([p.id for p in placeholders]))
+                    .execution_options(synchronize_session=False)
+                )
+            await recount_task_counters(target_session, [user_id])
+            await target_session.commit()
+        except Exception:
+            await target_session.rollback()
+            raise
+    return len(tasks) + len(archived)
+
+
+async def pin_user_shards(
+    router: ShardRouter, directory_session: AsyncSession
+) -> int:
+    result = await directory_session.execute(
+        select(User.id).where(User.task_shard.is_(None))
+    )
+    pinned = 0
+    for user_id in result.scalars().all():
+        await directory_session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .where(User.task_shard.is_(None))
+            .values(task_shard=router.hash_shard(user_id))
+        )
+        pinned += 1
+    await directory_session.commit()
+    return pinned
+
+
+async def rebalance_users(
+    router: ShardRouter,
+    directory_session: AsyncSession,
+    grace_seconds: float = TASK_MOVE_GRACE_SECONDS,
+) -> int:
+    result = await directory_session.execute(
+        select(User.id).where(User.task_shard.is_not(None))
+    )
+    moved = 0
+    for user_id in result.scalars().all():
+        target = router.hash_shard(user_id)
+        user = await directory_session.get(User, user_id)
+        if user.task_shard == target:
+            user.task_shard = None
+            await directory_session.commit()
+            continue
+        await move_user_tasks(
+            router, directory_session, user_id, target, grace_seconds
+        )
+        moved += 1
+    return moved
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from repository.database import get_database_url
+
+logger = logging.getLogger("app.token_cache")
+
+TOKEN_CACHE_SLOTS = int(os.getenv("TOKEN_CACHE_SLOTS", "65536"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+PROBES = 8
+READ_RETRIES = 3
+
+_MAGIC = b"TKC2"
+_HEADER = struct.Struct("<4sII")
+# sequence, user_id, valid_until, token_hash, login
+_SLOT = struct.Struct("<Iqd32s32s")
+_SEQUENCE = struct.Struct("<I")
+_REVOKED_USER_ID = -1
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    user_id: int
+    login: str
+
+
+REVOKED = CachedUser(_REVOKED_USER_ID, "")
+
+
+class InsecureCacheFileError(Exception):
+    pass
+
+
+# Fixed-size open-addressed table of token_hash -> user in a file mapped by
+# every worker on the node. Each slot is a seqlock: readers never lock and
+# treat a torn read as a miss, writers serialize on flock(). Revocations
+# leave a tombstone for the TTL, so a worker whose database read started
+# before the revoke cannot put the token back.
+class SharedTokenCache:
+    def __init__(self, path: str, slots: int, ttl: float) -> None:
+        if slots <= 0 or slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.path = path
+        self.slots = slots
+        self.ttl = ttl
+        self._mask = slots - 1
+        size = _HEADER.size + slots * _SLOT.size
+        self._fd = os.open(
+            path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600
+        )
+        try:
+            # The table decides who is logged in, so it must not be
+            # writable by anyone but us.
+            _check_private(os.fstat(self._fd), path)
+            with self._locked():
+                if os.fstat(self._fd).st_size != size:
+                    os.ftruncate(self._fd, size)
+                self._map = mmap.mmap(self._fd, size)
+                if _HEADER.unpack_from(self._map, 0) != (
+                    _MAGIC,
+                    slots,
+                    _SLOT.size,
+                ):
+                    self._map[:] = bytes(size)
+                    _HEADER.pack_into(
+                        self._map, 0, _MAGIC, slots, _SLOT.size
+                    )
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    @classmethod
+    def from_env(cls) -> SharedTokenCache | None:
+        if fcntl is None or TOKEN_CACHE_SLOTS <= 0:
+            return None
+        try:
+            path = os.getenv("TOKEN_CACHE_PATH") or _default_path()
+            return cls(path, TOKEN_CACHE_SLOTS, TOKEN_CACHE_TTL_SECONDS)
+        except (OSError, InsecureCacheFileError) as exc:
+            logger.warning(
+                "token cache disabled",
+                extra={"event": "token_cache_disabled", "error": str(exc)},
+            )
+            return None
+
+    def get(self, token_hash: bytes) -> CachedUser | None:
+        now = time.time()
+        home = self._home(token_hash)
+        for probe in range(PROBES):
+            slot = self._read(self._offset(home + probe))
+            if slot is None or slot[3] != token_hash:
+                continue
+            _, user_id, valid_until, _, login = slot
+            if valid_until <= now:
+                return None
+            if user_id == _REVOKED_USER_ID:
+                return REVOKED
+            return CachedUser(user_id, login.rstrip(b"\0").decode("utf-8"))
+        return None
+
+    def put(
+        self,
+        token_hash: bytes,
+        user_id: int,
+        login: str,
+        expires_at: datetime,
+    ) -> None:
+        encoded = login.encode("utf-8")
+        if len(encoded) > 32:
+            return
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        valid_until = min(expires_at.timestamp(), time.time() + self.ttl)
+        self._write(token_hash, user_id, encoded, valid_until)
+
+    def revoke(self, token_hash: bytes) -> None:
+        self._write(
+            token_hash, _REVOKED_USER_ID, b"", time.time() + self.ttl
+        )
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def _home(self, token_hash: bytes) -> int:
+        return int.from_bytes(token_hash[:8], "little")
+
+    def _offset(self, slot: int) -> int:
+        return _HEADER.size + (slot & self._mask) * _SLOT.size
+
+    def _read(self, offset: int) -> tuple | None:
+        for _ in range(READ_RETRIES):
+            slot = _SLOT.unpack_from(self._map, offset)
+            sequence = slot[0]
+            if (
+                not sequence & 1
+                and _SEQUENCE.unpack_from(self._map, offset)[0] == sequence
+            ):
+                return slot
+        return None
+
+    def _write(
+        self,
+        token_hash: bytes,
+        user_id: int,
+        login: bytes,
+        valid_until: float,
+    ) -> None:
+        now = time.time()
+        home = self._home(token_hash)
+        with self._locked():
+            target = free = oldest = None
+            oldest_until = float("inf")
+            for probe in range(PROBES):
+                offset = self._offset(home + probe)
+                _, slot_user_id, slot_until, key, _ = _SLOT.unpack_from(
+                    self._map, offset
+                )
+                if key == token_hash:
+                    if (
+                        slot_user_id == _REVOKED_USER_ID
+                        and slot_until > now
+                        and user_id != _REVOKED_USER_ID
+                    ):
+                        return
+                    target = offset
+                    break
+                if slot_until <= now:
+                    if free is None:
+                        free = offset
+                elif slot_until < oldest_until:
+                    oldest, oldest_until = offset, slot_until
+            if target is None:
+                target = free if free is not None else oldest
+            self._store(target, user_id, valid_until, token_hash, login)
+
+    def _store(
+        self,
+        offset: int,
+        user_id: int,
+        valid_until: float,
+        token_hash: bytes,
+        login: bytes,
+    ) -> None:
+        sequence = _SEQUENCE.unpack_from(self._map, offset)[0]
+        _SEQUENCE.pack_into(self._map, offset, (sequence + 1) & 0xFFFFFFFF)
+        _SLOT.pack_into(
+            self._map,
+            offset,
+            (sequence + 1) & 0xFFFFFFFF,
+            user_id,
+            valid_until,
+            token_hash,
+            login,
+        )
+        _SEQUENCE.pack_into(self._map, offset, (sequence + 2) & 0xFFFFFFFF)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+def _check_private(status: os.stat_result, path: str) -> None:
+    if status.st_uid != os.geteuid() or status.st_mode & 0o077:
+        raise InsecureCacheFileError(
+            f"{path} must be owned by the current user and not accessible "
+            f"to group or others"
+        )
+
+
+def _private_directory() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    directory = os.path.join(base, f"todo_token_cache-{os.geteuid()}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    status = os.lstat(directory)
+    if not stat.S_ISDIR(status.st_mode):
+        raise InsecureCacheFileError(f"{directory} is not a directory")
+    _check_private(status, directory)
+    return directory
+
+
+def _default_path() -> str:
+    # One table per database, so apps on the same node never share users.
+    digest = hashlib.sha256(get_database_url().encode("utf-8")).hexdigest()
+    return os.path.join(_private_directory(), digest[:16])
+
+
+token_cache = SharedTokenCache.from_env()
+
+
+def get_token_cache() -> SharedTokenCache | None:
+    return token_cache
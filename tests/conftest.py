@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 import sys
 
@@ -10,24 +11,36 @@ from sqlalchemy.pool import StaticPool
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(PROJECT_ROOT / "src"))
+os.environ.setdefault("TOKEN_CACHE_SLOTS", "0")
 
 from api.app import app  
 from repository.database import get_session  
 from repository.models import Base  
 
 
+@pytest.fixture(autouse=True)
+def no_token_cache(monkeypatch):
+    monkeypatch.setattr("repository.token_cache.token_cache", None)
+
+
 @pytest.fixture
-async def client() -> AsyncClient:
+async def session_factory():
     engine = create_async_engine(
         "sqlite+aiosqlite:///:memory:",
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
-    session_factory = async_sessionmaker(engine, expire_on_commit=False)
 
     async with engine.begin() as connection:
         await connection.run_sync(Base.metadata.create_all)
 
+    yield async_sessionmaker(engine, expire_on_commit=False)
+
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client(session_factory) -> AsyncClient:
     async def override_get_session():
         async with session_factory() as session:
             yield session
@@ -38,4 +51,19 @@ async def client() -> AsyncClient:
         yield async_client
 
     app.dependency_overrides.clear()
-    await engine.dispose()
+
+
+@pytest.fixture
+def login(client):
+    async def _login(login_value: str, password: str = "Strong1!") -> None:
+        await client.post(
+            "/api/register",
+            json={"login": login_value, "password": password},
+        )
+        response = await client.post(
+            "/api/login",
+            json={"login": login_value, "password": password},
+        )
+        assert response.status_code == 200
+
+    return _login
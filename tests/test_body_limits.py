@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+from api.app import app
+from api.body_limits import BodyLimitMiddleware, JsonArrayItemCounter
+from api.load_shedding import LoadSheddingMiddleware
+from api.schemas import (
+    MAX_TASK_TITLE_LENGTH,
+    MAX_TASKS_PER_REQUEST,
+    RegisterRequest,
+    missing_password_classes,
+)
+
+
+def _count_in_chunks(payload: bytes, size: int) -> int:
+    counter = JsonArrayItemCounter()
+    for start in range(0, len(payload), size):
+        counter.feed(payload[start:start + size])
+    return counter.items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 4096])
+def test_item_counter_ignores_structure_inside_strings(chunk_size):
+    tasks = [
+        {"title": 'tricky {"a": [1, 2]} \\" }', "is_done": False},
+        {"title": "\\", "is_done": True, "nested": {"x": [{}]}},
+        {"title": "plain", "is_done": False},
+    ]
+    payload = json.dumps(tasks).encode("utf-8")
+
+    assert _count_in_chunks(payload, chunk_size) == 3
+
+
+@pytest.mark.parametrize(
+    "password, missing",
+    [
+        ("Strong1!", []),
+        (
+            "weakpass",
+            ["one uppercase letter", "one digit", "one special character"],
+        ),
+        ("WEAK1234", ["one lowercase letter", "one special character"]),
+        ("Strong٣!", []),
+        ("Strong٣x", []),
+    ],
+)
+def test_password_classes_match_regex_rules(password, missing):
+    assert missing_password_classes(password) == missing
+
+
+def test_register_login_is_trimmed():
+    request = RegisterRequest(login="  user_1  ", password="Strong1!")
+
+    assert request.login == "user_1"
+
+
+@pytest.mark.asyncio
+async def test_too_many_tasks_rejected_before_parsing(client, login):
+    await login("limits")
+    response = await client.post(
+        "/api/tasks",
+        json=[
+            {"title": "t", "is_done": False}
+            for _ in range(MAX_TASKS_PER_REQUEST + 1)
+        ],
+    )
+
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Too many items in request body"}
+
+
+@pytest.mark.asyncio
+async def test_oversized_body_rejected(client, login):
+    await login("limits_size")
+    response = await client.post(
+        "/api/tasks",
+        content=b"[" + b" " * (2 * 1024 * 1024) + b"]",
+        headers={"Content-Type": "application/json"},
+    )
+
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body is too large"}
+
+
+@pytest.mark.asyncio
+async def test_long_title_rejected(client, login):
+    await login("limits_title")
+    response = await client.post(
+        "/api/tasks",
+        json=[{"title": "x" * (MAX_TASK_TITLE_LENGTH + 1), "is_done": False}],
+    )
+
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_tasks_within_limits_saved(client, login):
+    await login("limits_ok")
+    response = await client.post(
+        "/api/tasks",
+        json=[
+            {"title": "t", "is_done": False}
+            for _ in range(MAX_TASKS_PER_REQUEST)
+        ],
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()) == MAX_TASKS_PER_REQUEST
+
+
+def test_body_limits_run_inside_load_shedding():
+    order = [middleware.cls for middleware in app.user_middleware]
+
+    assert order.index(LoadSheddingMiddleware) < order.index(
+        BodyLimitMiddleware
+    )
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from starlette.responses import StreamingResponse
+
+from api.compression import CompressionMiddleware, negotiate_encoding
+
+
+def test_negotiate_encoding_respects_quality():
+    supported = ["zstd", "br", "gzip"]
+
+    assert negotiate_encoding("gzip, br;q=0.5", supported) == "gzip"
+    assert negotiate_encoding("gzip;q=0, *;q=0.1", supported) == "zstd"
+    assert negotiate_encoding("identity", supported) is None
+
+
+@pytest.mark.asyncio
+async def test_large_task_list_is_compressed(client, login):
+    await login("packer")
+    tasks = [{"title": f"task {i}", "is_done": False} for i in range(200)]
+    await client.post("/api/tasks", json=tasks)
+
+    first = await client.get(
+        "/api/tasks", headers={"Accept-Encoding": "gzip"}
+    )
+    second = await client.get(
+        "/api/tasks", headers={"Accept-Encoding": "gzip"}
+    )
+
+    assert first.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in first.headers["vary"]
+    assert len(first.json()) == 200
+    assert second.content == first.content
+
+
+@pytest.mark.asyncio
+async def test_small_response_is_not_compressed(client, login):
+    await login("tiny")
+
+    response = await client.get("/api/me", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_streaming_response_is_passed_through():
+    async def chunks():
+        yield b"x" * 4096
+        yield b"y" * 4096
+
+    async def streaming_app(scope, receive, send):
+        await StreamingResponse(chunks())(scope, receive, send)
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    middleware = CompressionMiddleware(streaming_app, minimum_size=10)
+    await middleware(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/stream",
+            "headers": [(b"accept-encoding", b"gzip")],
+        },
+        receive,
+        send,
+    )
+
+    headers = dict(sent[0]["headers"])
+    assert b"content-encoding" not in headers
+    assert [message.get("body") for message in sent[1:3]] == [
+        b"x" * 4096,
+        b"y" * 4096,
+    ]
@@ -0,0 +1,235 @@
+import asyncio
+
+import pytest
+
+from api.idempotency import (
+    PENDING_STATUS,
+    DatabaseIdempotencyStore,
+    IdempotencyMiddleware,
+    IdempotencyRecord,
+    MemoryIdempotencyStore,
+)
+
+
+@pytest.mark.asyncio
+async def test_register_replay_returns_stored_response(client):
+    payload = {"login": "retry_1", "password": "Strong1!"}
+    headers = {"Idempotency-Key": "register-1"}
+
+    first = await client.post("/api/register", json=payload, headers=headers)
+    second = await client.post("/api/register", json=payload, headers=headers)
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert second.json() == first.json()
+    assert second.headers["idempotent-replayed"] == "true"
+
+
+@pytest.mark.asyncio
+async def test_key_reuse_with_different_body_is_rejected(client, login):
+    await login("retry_2")
+    headers = {"Idempotency-Key": "tasks-2"}
+    await client.post(
+        "/api/tasks",
+        json=[{"title": "first", "is_done": False}],
+        headers=headers,
+    )
+
+    response = await client.post(
+        "/api/tasks",
+        json=[{"title": "second", "is_done": False}],
+        headers=headers,
+    )
+
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_anonymous_clients_do_not_share_keys(client):
+    headers = {"Idempotency-Key": "1"}
+
+    first = await client.post(
+        "/api/register",
+        json={"login": "retry_3a", "password": "Strong1!"},
+        headers=headers,
+    )
+    second = await client.post(
+        "/api/register",
+        json={"login": "retry_3b", "password": "Strong1!"},
+        headers=headers,
+    )
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert "idempotent-replayed" not in second.headers
+
+
+@pytest.mark.asyncio
+async def test_inflight_duplicates_coalesce(client):
+    payload = {"login": "retry_4", "password": "Strong1!"}
+    headers = {"Idempotency-Key": "register-3"}
+
+    responses = await asyncio.gather(
+        client.post("/api/register", json=payload, headers=headers),
+        client.post("/api/register", json=payload, headers=headers),
+    )
+
+    assert [response.status_code for response in responses] == [201, 201]
+
+
+@pytest.mark.asyncio
+async def test_tasks_replay_skips_write_path(client, login):
+    await login("retry_5")
+    headers = {"Idempotency-Key": "tasks-1"}
+    tasks = [{"title": "once", "is_done": False}]
+
+    first = await client.post("/api/tasks", json=tasks, headers=headers)
+    second = await client.post("/api/tasks", json=tasks, headers=headers)
+
+    assert second.json() == first.json()
+    listed = await client.get("/api/tasks")
+    assert listed.json() == first.json()
+
+
+@pytest.mark.asyncio
+async def test_memory_store_evicts_oldest_key():
+    store = MemoryIdempotencyStore(ttl_seconds=60, max_keys=1)
+    record = IdempotencyRecord("f", 201, [], b"{}")
+
+    await store.put("a", record)
+    await store.put("b", record)
+
+    assert await store.get("a") is None
+    assert await store.get("b") == record
+
+
+@pytest.mark.asyncio
+async def test_database_store_roundtrip(session_factory):
+    store = DatabaseIdempotencyStore(session_factory, ttl_seconds=60)
+    record = IdempotencyRecord(
+        "f", 201, [(b"content-type", b"application/json")], b"{}"
+    )
+
+    await store.put("a", record)
+
+    assert await store.get("a") == record
+    assert await store.get("missing") is None
+
+
+async def _call(middleware, key, query_string=b"", body=b"{}"):
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/tasks",
+        "query_string": query_string,
+        "headers": [(b"idempotency-key", key.encode())],
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"])
+
+
+def _stub_app(statuses, release=None):
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope)
+        if release is not None:
+            await release.wait()
+        await asyncio.sleep(0.01)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": statuses[min(len(calls), len(statuses)) - 1],
+                "headers": [],
+            }
+        )
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    return app, calls
+
+
+def _middleware(app, store):
+    return IdempotencyMiddleware(
+        app,
+        store=store,
+        routes=(("POST", "/api/tasks"),),
+        credential_cookie="auth_token",
+    )
+
+
+@pytest.mark.asyncio
+async def test_failed_first_request_is_retried_once_for_waiters():
+    app, calls = _stub_app([500, 200])
+    middleware = _middleware(app, MemoryIdempotencyStore(60, 100))
+
+    results = await asyncio.gather(
+        *[_call(middleware, "k") for _ in range(4)]
+    )
+
+    assert [status for status, _ in results] == [500, 200, 200, 200]
+    assert len(calls) == 2
+    assert middleware._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_query_string_is_part_of_the_key(client, login):
+    await login("retry_6")
+    headers = {"Idempotency-Key": "tasks-6"}
+    await client.post(
+        "/api/tasks",
+        params={"replace": False},
+        json=[{"title": "appended", "is_done": False}],
+        headers=headers,
+    )
+
+    response = await client.post(
+        "/api/tasks",
+        params={"replace": True},
+        json=[{"title": "appended", "is_done": False}],
+        headers=headers,
+    )
+
+    assert "idempotent-replayed" not in response.headers
+    assert [t["title"] for t in response.json()] == ["appended"]
+
+
+@pytest.mark.asyncio
+async def test_database_store_claims_key_once(session_factory):
+    store = DatabaseIdempotencyStore(session_factory, ttl_seconds=60)
+
+    assert await store.claim("a", "f")
+    assert not await store.claim("a", "f")
+    assert (await store.get("a")).status_code == PENDING_STATUS
+    await store.release("a")
+    assert await store.claim("a", "f")
+
+
+@pytest.mark.asyncio
+async def test_key_held_by_another_worker_is_not_run_twice(session_factory):
+    store = DatabaseIdempotencyStore(session_factory, ttl_seconds=60)
+    release = asyncio.Event()
+    app, calls = _stub_app([201], release)
+    first_worker = _middleware(app, store)
+    second_worker = _middleware(app, store)
+
+    first = asyncio.create_task(_call(first_worker, "k"))
+    while not calls:
+        await asyncio.sleep(0.01)
+    status, headers = await _call(second_worker, "k")
+    release.set()
+    await first
+    replayed, replay_headers = await _call(second_worker, "k")
+
+    assert status == 409
+    assert headers[b"retry-after"] == b"1"
+    assert len(calls) == 1
+    assert replayed == 201
+    assert replay_headers[b"idempotent-replayed"] == b"true"
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from api.load_shedding import (
+    LoadShedder,
+    LoadSheddingMiddleware,
+    PriorityLimiter,
+    RouteClass,
+)
+
+
+@pytest.mark.asyncio
+async def test_limiter_grants_higher_priority_first():
+    limiter = PriorityLimiter(capacity=1, max_waiters=4)
+    await limiter.acquire(priority=0, timeout=1)
+    order = []
+
+    async def wait(name: str, priority: int) -> None:
+        await limiter.acquire(priority, timeout=1)
+        order.append(name)
+        limiter.release()
+
+    waiters = [
+        asyncio.create_task(wait("write", 2)),
+        asyncio.create_task(wait("read", 1)),
+    ]
+    await asyncio.sleep(0)
+    limiter.release()
+    await asyncio.gather(*waiters)
+
+    assert order == ["read", "write"]
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_times_out_and_forgets_waiter():
+    limiter = PriorityLimiter(capacity=1, max_waiters=4)
+    await limiter.acquire(priority=0, timeout=1)
+
+    assert await limiter.acquire(priority=0, timeout=0.01) is False
+    assert limiter.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_saturated_route_is_shed_with_retry_after():
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    shedder = LoadShedder(
+        capacity=8,
+        queue_size=8,
+        classes=[
+            RouteClass(
+                "write", priority=2, concurrency=1, queue_size=0, queue_timeout=1
+            )
+        ],
+        routes={("POST", "/api/tasks"): "write"},
+    )
+    app = LoadSheddingMiddleware(slow_app, shedder)
+    transport = ASGITransport(app=app)
+
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = asyncio.create_task(client.post("/api/tasks"))
+        await asyncio.sleep(0.05)
+        shed = await client.post("/api/tasks")
+        release.set()
+        admitted = await first
+
+    assert admitted.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "1"
+    stats = shedder.snapshot()["classes"]["write"]
+    assert stats["shed"]["queue_full"] == 1
+    assert stats["admitted"] == 1
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_load_stats_endpoint(client, monkeypatch):
+    monkeypatch.setattr("api.routes.LOAD_STATS_TOKEN", "secret")
+    await client.get("/api/me")
+
+    anonymous = await client.get("/api/load")
+    wrong = await client.get(
+        "/api/load", headers={"X-Load-Stats-Token": "guess"}
+    )
+    response = await client.get(
+        "/api/load", headers={"X-Load-Stats-Token": "secret"}
+    )
+
+    assert anonymous.status_code == 404
+    assert wrong.status_code == 404
+    assert response.status_code == 200
+    assert response.json()["classes"]["auth"]["admitted"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_load_stats_disabled_without_token(client):
+    response = await client.get(
+        "/api/load", headers={"X-Load-Stats-Token": ""}
+    )
+
+    assert response.status_code == 404
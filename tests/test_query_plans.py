@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+import json
+import os
+import re
+
+import pytest
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from repository.crud import (
+    archive_done_tasks,
+    get_task_counters,
+    purge_idempotency_keys,
+    repair_task_counters,
+)
+from repository.models import AuthSession, Base, Task, User
+from repository.security import hash_token
+
+SEED_USERS = 200
+SEED_TASKS_PER_USER = 50
+SEED_SESSIONS_PER_USER = 3
+WATCHED_TABLES = {"tasks", "tasks_archive", "sessions"}
+DML_KEYWORDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+# A one-sided range on the primary key walks the rest of the table.
+SQLITE_PK_RANGE = re.compile(
+    r"^SEARCH (\w+) USING (?:INTEGER )?PRIMARY KEY \(rowid[<>]=?\?\)$"
+)
+
+
+class StatementRecorder:
+    def __init__(self, engine) -> None:
+        self.statements: list[tuple[str, object]] = []
+        event.listen(engine.sync_engine, "before_cursor_execute", self._record)
+
+    def _record(
+        self, conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        keyword = statement.lstrip().split(None, 1)[0].upper()
+        if keyword not in DML_KEYWORDS:
+            return
+        if executemany and isinstance(parameters[0], (tuple, list, dict)):
+            parameters = parameters[0]
+        self.statements.append((statement, parameters))
+
+    def clear(self) -> None:
+        self.statements.clear()
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+async def plan_engine(request):
+    if request.param == "sqlite":
+        engine = create_async_engine(
+            "sqlite+aiosqlite:///:memory:",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+    else:
+        url = os.getenv("TEST_POSTGRES_URL")
+        if not url:
+            pytest.skip("TEST_POSTGRES_URL is not set")
+        engine = create_async_engine(url, poolclass=StaticPool)
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    await _seed(engine)
+    yield engine
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.fixture
+async def session_factory(plan_engine):
+    return async_sessionmaker(plan_engine, expire_on_commit=False)
+
+
+@pytest.fixture
+def recorder(plan_engine):
+    recorder = StatementRecorder(plan_engine)
+    yield recorder
+    event.remove(
+        plan_engine.sync_engine, "before_cursor_execute", recorder._record
+    )
+
+
+async def _seed(engine) -> None:
+    old = datetime.now(timezone.utc) - timedelta(days=90)
+    expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+    async with engine.begin() as connection:
+        await connection.execute(
+            insert(User),
+            [
+                {"login": f"seed_{i}", "password_hash": "seed"}
+                for i in range(SEED_USERS)
+            ],
+        )
+        user_ids = (await connection.execute(select(User.id))).scalars().all()
+        await connection.execute(
+            insert(Task),
+            [
+                {
+                    "user_id": user_id,
+                    "title": f"seed task {i}",
+                    "is_done": i % 10 != 0,
+                    "created_at": old,
+                    "done_at": old if i % 10 != 0 else None,
+                }
+                for user_id in user_ids
+                for i in range(SEED_TASKS_PER_USER)
+            ],
+        )
+        await connection.execute(
+            insert(AuthSession),
+            [
+                {
+                    "user_id": user_id,
+                    "token_digest": hash_token(f"seed-{user_id}-{i}"),
+                    "expires_at": expires_at,
+                }
+                for user_id in user_ids
+                for i in range(SEED_SESSIONS_PER_USER)
+            ],
+        )
+        await connection.exec_driver_sql("ANALYZE")
+
+
+async def _full_scans(connection, statement: str, parameters) -> set[str]:
+    if connection.dialect.name == "sqlite":
+        result = await connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + statement, parameters
+        )
+        scans = set()
+        for row in result:
+            match = SQLITE_SCAN.match(row[-1]) or SQLITE_PK_RANGE.match(
+                row[-1]
+            )
+            if match:
+                scans.add(match.group(1))
+        return scans & WATCHED_TABLES
+
+    result = await connection.exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + statement, parameters
+    )
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans = set()
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        node_type = node.get("Node Type")
+        # With enable_seqscan=off a full walk shows up as an index scan
+        # without any index condition.
+        if node_type == "Seq Scan" or (
+            node_type in ("Index Scan", "Index Only Scan")
+            and "Index Cond" not in node
+        ):
+            scans.add(node.get("Relation Name"))
+        nodes.extend(node.get("Plans", []))
+    return scans & WATCHED_TABLES
+
+
+async def _assert_no_full_scans(engine, recorder: StatementRecorder) -> None:
+    assert recorder.statements
+    async with engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            await connection.exec_driver_sql("SET enable_seqscan = off")
+        for statement, parameters in recorder.statements:
+            scans = await _full_scans(connection, statement, parameters)
+            assert not scans, f"full scan of {sorted(scans)}: {statement}"
+
+
+async def _register(client, recorder):
+    recorder.clear()
+    return await client.post(
+        "/api/register",
+        json={"login": "planner_2", "password": "Strong1!"},
+    )
+
+
+async def _login(client, recorder):
+    recorder.clear()
+    return await client.post(
+        "/api/login",
+        json={"login": "planner", "password": "Strong1!"},
+    )
+
+
+async def _me(client, recorder):
+    recorder.clear()
+    return await client.get("/api/me")
+
+
+async def _logout(client, recorder):
+    recorder.clear()
+    return await client.post("/api/logout")
+
+
+async def _get_tasks(client, recorder):
+    recorder.clear()
+    return await client.get("/api/tasks")
+
+
+async def _get_tasks_with_archive(client, recorder):
+    recorder.clear()
+    return await client.get("/api/tasks", params={"include_archived": True})
+
+
+async def _get_summary(client, recorder):
+    recorder.clear()
+    return await client.get("/api/tasks/summary")
+
+
+async def _post_tasks_replace(client, recorder):
+    recorder.clear()
+    return await client.post(
+        "/api/tasks",
+        params={"replace": True},
+        json=[{"title": f"new {i}", "is_done": False} for i in range(20)],
+    )
+
+
+async def _post_tasks_insert(client, recorder):
+    recorder.clear()
+    return await client.post(
+        "/api/tasks",
+        params={"replace": False},
+        json=[{"title": f"new {i}", "is_done": False} for i in range(20)],
+    )
+
+
+async def _post_tasks_versioned(client, recorder):
+    tasks = (await client.get("/api/tasks")).json()
+    changed = [
+        {**tasks[0], "is_done": True},
+        {**tasks[1], "title": "renamed"},
+        {**tasks[2], "deleted": True},
+        *tasks[3:],
+        {"title": "added", "is_done": False},
+    ]
+    recorder.clear()
+    return await client.post("/api/tasks", json=changed)
+
+
+ENDPOINTS = [
+    pytest.param(_register, 201, 2, id="register"),
+    pytest.param(_login, 200, 2, id="login"),
+    pytest.param(_me, 200, 1, id="me"),
+    pytest.param(_logout, 204, 1, id="logout"),
+    pytest.param(_get_tasks, 200, 2, id="get_tasks"),
+    pytest.param(_get_tasks_with_archive, 200, 3, id="get_tasks_archived"),
+    pytest.param(_get_summary, 200, 2, id="get_summary"),
+    pytest.param(_post_tasks_replace, 200, 4, id="post_tasks_replace"),
+    pytest.param(_post_tasks_insert, 200, 5, id="post_tasks_insert"),
+    pytest.param(_post_tasks_versioned, 200, 8, id="post_tasks_versioned"),
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("scenario, expected_status, max_statements", ENDPOINTS)
+async def test_endpoint_uses_indexes(
+    client,
+    login,
+    plan_engine,
+    recorder,
+    scenario,
+    expected_status,
+    max_statements,
+):
+    await login("planner")
+    await client.post(
+        "/api/tasks",
+        json=[{"title": f"mine {i}", "is_done": False} for i in range(10)],
+    )
+
+    response = await scenario(client, recorder)
+
+    assert response.status_code == expected_status
+    assert len(recorder.statements) <= max_statements, [
+        statement for statement, _ in recorder.statements
+    ]
+    await _assert_no_full_scans(plan_engine, recorder)
+
+
+@pytest.mark.asyncio
+async def test_maintenance_jobs_use_indexes(
+    session_factory, plan_engine, recorder
+):
+    cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+    async with session_factory() as session:
+        archived = await archive_done_tasks(session, cutoff, batch_size=1000)
+        await repair_task_counters(session, batch_size=50)
+        await get_task_counters(session, 1)
+        await purge_idempotency_keys(session, cutoff)
+
+    assert archived > 0
+    await _assert_no_full_scans(plan_engine, recorder)
@@ -1,5 +1,12 @@
+from datetime import datetime, timedelta, timezone
+import secrets
+
 import pytest
 
+from repository.crud import get_user_by_login
+from repository.models import AuthSession
+from repository.security import hash_token
+
 
 @pytest.mark.asyncio
 async def test_register_success(client):
@@ -37,3 +44,32 @@ async def test_register_weak_password(client):
     assert response.status_code == 422
     detail = response.json().get("detail", [])
     assert any(item.get("loc", [])[-1] == "password" for item in detail)
+
+
+@pytest.mark.asyncio
+async def test_session_is_found_by_binary_digest(
+    client, session_factory
+):
+    await client.post(
+        "/api/register",
+        json={"login": "legacy_1", "password": "Strong1!"},
+    )
+    token = secrets.token_urlsafe(32)
+    async with session_factory() as session:
+        user = await get_user_by_login(session, "legacy_1")
+        session.add(
+            AuthSession(
+                user_id=user.id,
+                token_digest=hash_token(token),
+                expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
+            )
+        )
+        await session.commit()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    me = await client.get("/api/me", headers=headers)
+    await client.post("/api/logout", headers=headers)
+    after_logout = await client.get("/api/me", headers=headers)
+
+    assert me.json()["login"] == "legacy_1"
+    assert after_logout.status_code == 401
@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from api.app import app
+from repository.crud import archive_done_tasks
+from repository.models import Task
+from repository.sharding import ShardRouter, get_shard_router, move_user_tasks
+
+
+@pytest.fixture
+async def shard_router(tmp_path):
+    router = ShardRouter(
+        [f"sqlite+aiosqlite:///{tmp_path / f'shard_{i}.db'}" for i in range(3)]
+    )
+    await router.create_schema()
+    app.dependency_overrides[get_shard_router] = lambda: router
+    yield router
+    app.dependency_overrides.pop(get_shard_router, None)
+    await router.dispose()
+
+
+async def _count_tasks(session_factory, user_id: int) -> int:
+    async with session_factory() as session:
+        result = await session.execute(
+            select(func.count()).select_from(Task).where(Task.user_id == user_id)
+        )
+        return result.scalar_one()
+
+
+def test_hash_shard_is_stable_and_spread(shard_router):
+    placements = [shard_router.hash_shard(user_id) for user_id in range(300)]
+
+    assert placements == [shard_router.hash_shard(i) for i in range(300)]
+    assert set(placements) == {0, 1, 2}
+
+
+@pytest.mark.asyncio
+async def test_tasks_are_stored_on_user_shard(
+    client, login, session_factory, shard_router
+):
+    await login("sharded_1")
+    user_id = (await client.get("/api/me")).json()["id"]
+
+    await client.post("/api/tasks", json=[{"title": "a", "is_done": False}])
+
+    home = shard_router.hash_shard(user_id)
+    assert await _count_tasks(shard_router.session_factories[home], user_id) == 1
+    assert await _count_tasks(session_factory, user_id) == 0
+    listed = await client.get("/api/tasks")
+    assert [task["title"] for task in listed.json()] == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_move_user_tasks_between_shards(
+    client, login, session_factory, shard_router
+):
+    await login("sharded_2")
+    user_id = (await client.get("/api/me")).json()["id"]
+    await client.post(
+        "/api/tasks",
+        json=[
+            {"title": "old", "is_done": True},
+            {"title": "new", "is_done": False},
+        ],
+    )
+    home = shard_router.hash_shard(user_id)
+    async with shard_router.session_factories[home]() as session:
+        cutoff = datetime.now(timezone.utc) + timedelta(minutes=1)
+        await archive_done_tasks(session, cutoff)
+    target = (home + 1) % 3
+
+    async with session_factory() as session:
+        moved = await move_user_tasks(
+            shard_router, session, user_id, target, grace_seconds=0
+        )
+
+    assert moved == 2
+    assert await _count_tasks(shard_router.session_factories[home], user_id) == 0
+    assert await _count_tasks(shard_router.session_factories[target], user_id) == 1
+    listed = await client.get("/api/tasks", params={"include_archived": True})
+    assert sorted(task["title"] for task in listed.json()) == ["new", "old"]
+
+
+@pytest.mark.asyncio
+async def test_cached_token_follows_moved_user(
+    client, login, session_factory, shard_router, tmp_path, monkeypatch
+):
+    pytest.importorskip("fcntl")
+    from repository.token_cache import SharedTokenCache
+
+    cache = SharedTokenCache(str(tmp_path / "token_cache"), 64, 60)
+    monkeypatch.setattr("repository.token_cache.token_cache", cache)
+    await login("sharded_3")
+    user_id = (await client.get("/api/me")).json()["id"]
+    await client.post("/api/tasks", json=[{"title": "a", "is_done": False}])
+    target = (shard_router.hash_shard(user_id) + 1) % 3
+
+    async with session_factory() as session:
+        await move_user_tasks(
+            shard_router, session, user_id, target, grace_seconds=0
+        )
+    listed = await client.get("/api/tasks")
+
+    assert [task["title"] for task in listed.json()] == ["a"]
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_rerun_after_interrupted_move_does_not_duplicate(
+    client, login, session_factory, shard_router, monkeypatch
+):
+    await login("sharded_4")
+    user_id = (await client.get("/api/me")).json()["id"]
+    await client.post(
+        "/api/tasks",
+        json=[
+            {"title": "a", "is_done": False},
+            {"title": "b", "is_done": True},
+        ],
+    )
+    home = shard_router.hash_shard(user_id)
+    target = (home + 1) % 3
+
+    async with session_factory() as session:
+        commit = session.commit
+        commits = 0
+
+        async def crash_before_flip():
+            nonlocal commits
+            commits += 1
+            if commits == 2:
+                raise RuntimeError("crashed before the directory flip")
+            await commit()
+
+        monkeypatch.setattr(session, "commit", crash_before_flip)
+        with pytest.raises(RuntimeError):
+            await move_user_tasks(
+                shard_router, session, user_id, target, grace_seconds=0
+            )
+    fenced = await client.post(
+        "/api/tasks", json=[{"title": "lost", "is_done": False}]
+    )
+    async with session_factory() as session:
+        moved = await move_user_tasks(
+            shard_router, session, user_id, target, grace_seconds=0
+        )
+
+    assert fenced.status_code == 503
+    assert moved == 2
+    assert await _count_tasks(shard_router.session_factories[home], user_id) == 0
+    assert await _count_tasks(shard_router.session_factories[target], user_id) == 2
+    listed = await client.get("/api/tasks")
+    assert [task["title"] for task in listed.json()] == ["a", "b"]
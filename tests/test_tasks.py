@@ -0,0 +1,283 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from sqlalchemy import update
+
+from repository.crud import archive_done_tasks, repair_task_counters
+from repository.models import Task, TaskCounter
+
+
+@pytest.mark.asyncio
+async def test_post_tasks_keeps_other_users_tasks(client, login):
+    await login("owner_1")
+    await client.post(
+        "/api/tasks", json=[{"title": "first", "is_done": False}]
+    )
+    await login("owner_2")
+    await client.post(
+        "/api/tasks", json=[{"title": "second", "is_done": False}]
+    )
+
+    await login("owner_1")
+    response = await client.get("/api/tasks")
+
+    assert [task["title"] for task in response.json()] == ["first"]
+
+
+@pytest.mark.asyncio
+async def test_archived_tasks_hidden_by_default(
+    client, login, session_factory
+):
+    await login("archiver")
+    await client.post(
+        "/api/tasks",
+        json=[
+            {"title": "done", "is_done": True},
+            {"title": "open", "is_done": False},
+        ],
+    )
+
+    cutoff = datetime.now(timezone.utc) + timedelta(minutes=1)
+    async with session_factory() as session:
+        archived = await archive_done_tasks(session, cutoff, batch_size=1)
+
+    assert archived == 1
+    hot = await client.get("/api/tasks")
+    assert [task["title"] for task in hot.json()] == ["open"]
+    full = await client.get("/api/tasks", params={"include_archived": True})
+    assert [task["title"] for task in full.json()] == ["done", "open"]
+
+
+@pytest.mark.asyncio
+async def test_versioned_update_bumps_only_changed_rows(client, login):
+    await login("editor_1")
+    created = await client.post(
+        "/api/tasks",
+        json=[
+            {"title": "a", "is_done": False},
+            {"title": "b", "is_done": False},
+        ],
+    )
+    first, second = created.json()
+
+    response = await client.post(
+        "/api/tasks",
+        json=[
+            {**first, "is_done": True},
+            second,
+            {"title": "c", "is_done": False},
+        ],
+    )
+
+    assert response.status_code == 200
+    tasks = response.json()
+    assert [(t["title"], t["version"]) for t in tasks] == [
+        ("a", 2),
+        ("b", 1),
+        ("c", 1),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stale_version_returns_conflict(client, login):
+    await login("editor_2")
+    created = await client.post(
+        "/api/tasks", json=[{"title": "a", "is_done": False}]
+    )
+    task = created.json()[0]
+    await client.post("/api/tasks", json=[{**task, "title": "from phone"}])
+
+    response = await client.post(
+        "/api/tasks", json=[{**task, "title": "from laptop"}]
+    )
+
+    assert response.status_code == 409
+    assert [t["title"] for t in response.json()["tasks"]] == ["from phone"]
+
+
+@pytest.mark.asyncio
+async def test_deleted_flag_removes_task(client, login):
+    await login("editor_3")
+    created = await client.post(
+        "/api/tasks",
+        json=[
+            {"title": "keep", "is_done": False},
+            {"title": "drop", "is_done": False},
+        ],
+    )
+    keep, drop = created.json()
+
+    response = await client.post(
+        "/api/tasks", json=[keep, {**drop, "deleted": True}]
+    )
+
+    assert [t["title"] for t in response.json()] == ["keep"]
+
+
+@pytest.mark.asyncio
+async def test_summary_tracks_every_write(client, login, session_factory):
+    await login("counter_1")
+    created = await client.post(
+        "/api/tasks",
+        json=[
+            {"title": "a", "is_done": False},
+            {"title": "b", "is_done": False},
+            {"title": "c", "is_done": True},
+        ],
+    )
+    a, b, c = created.json()
+    await client.post(
+        "/api/tasks",
+        json=[{**a, "is_done": True}, {**b, "deleted": True}, c],
+    )
+    cutoff = datetime.now(timezone.utc) + timedelta(minutes=1)
+    async with session_factory() as session:
+        await archive_done_tasks(session, cutoff)
+    await client.post("/api/tasks", json=[{"title": "d", "is_done": False}])
+
+    response = await client.get("/api/tasks/summary")
+
+    assert response.json() == {"open": 1, "done": 0, "archived": 2}
+
+
+@pytest.mark.asyncio
+async def test_repair_recomputes_counters(client, login, session_factory):
+    await login("counter_2")
+    await client.post(
+        "/api/tasks",
+        json=[
+            {"title": "a", "is_done": False},
+            {"title": "b", "is_done": True},
+        ],
+    )
+    async with session_factory() as session:
+        await session.execute(
+            update(TaskCounter).values(open_count=40, done_count=-3)
+        )
+        await session.commit()
+        repaired = await repair_task_counters(session, batch_size=1)
+
+    assert repaired == 1
+    response = await client.get("/api/tasks/summary")
+    assert response.json() == {"open": 1, "done": 1, "archived": 0}
+
+
+@pytest.mark.asyncio
+async def test_legacy_full_list_save_replaces_tasks(client, login):
+    await login("legacy")
+    tasks = [
+        {"title": "a", "is_done": False},
+        {"title": "b", "is_done": True},
+    ]
+    await client.post("/api/tasks", json=tasks)
+
+    response = await client.post("/api/tasks", json=tasks)
+    summary = await client.get("/api/tasks/summary")
+
+    assert [t["title"] for t in response.json()] == ["a", "b"]
+    assert summary.json() == {"open": 1, "done": 1, "archived": 0}
+
+
+@pytest.mark.asyncio
+async def test_new_tasks_are_appended_when_replace_is_off(client, login):
+    await login("appender")
+    await client.post(
+        "/api/tasks", json=[{"title": "from laptop", "is_done": False}]
+    )
+
+    response = await client.post(
+        "/api/tasks",
+        params={"replace": False},
+        json=[{"title": "from phone", "is_done": False}],
+    )
+    empty = await client.post(
+        "/api/tasks", params={"replace": False}, json=[]
+    )
+
+    assert [t["title"] for t in response.json()] == [
+        "from laptop",
+        "from phone",
+    ]
+    assert len(empty.json()) == 2
+
+
+@pytest.mark.asyncio
+async def test_replace_flag_overwrites_list(client, login):
+    await login("replacer")
+    await client.post(
+        "/api/tasks", json=[{"title": "old", "is_done": False}]
+    )
+
+    response = await client.post(
+        "/api/tasks",
+        params={"replace": True},
+        json=[{"title": "new", "is_done": False}],
+    )
+
+    assert [t["title"] for t in response.json()] == ["new"]
+
+
+@pytest.mark.asyncio
+async def test_archived_tasks_can_be_saved_back_and_restored(
+    client, login, session_factory
+):
+    await login("archive_echo")
+    await client.post(
+        "/api/tasks",
+        json=[
+            {"title": "done", "is_done": True},
+            {"title": "open", "is_done": False},
+        ],
+    )
+    cutoff = datetime.now(timezone.utc) + timedelta(minutes=1)
+    async with session_factory() as session:
+        await archive_done_tasks(session, cutoff)
+    full = await client.get("/api/tasks", params={"include_archived": True})
+    done, open_task = full.json()
+
+    saved = await client.post(
+        "/api/tasks", json=[done, {**open_task, "is_done": True}]
+    )
+    restored = await client.post(
+        "/api/tasks", json=[{**done, "is_done": False}]
+    )
+    summary = await client.get("/api/tasks/summary")
+
+    assert saved.status_code == 200
+    assert [(t["title"], t["is_done"]) for t in saved.json()] == [
+        ("open", True)
+    ]
+    assert restored.status_code == 200
+    assert [(t["id"], t["is_done"]) for t in restored.json()] == [
+        (done["id"], False),
+        (open_task["id"], True),
+    ]
+    assert summary.json() == {"open": 1, "done": 1, "archived": 0}
+
+
+@pytest.mark.asyncio
+async def test_old_task_is_archived_by_completion_time(
+    client, login, session_factory
+):
+    await login("late_finisher")
+    created = await client.post(
+        "/api/tasks", json=[{"title": "old", "is_done": False}]
+    )
+    task = created.json()[0]
+    async with session_factory() as session:
+        await session.execute(
+            update(Task).values(
+                created_at=datetime.now(timezone.utc) - timedelta(days=40)
+            )
+        )
+        await session.commit()
+
+    await client.post("/api/tasks", json=[{**task, "is_done": True}])
+    cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+    async with session_factory() as session:
+        archived = await archive_done_tasks(session, cutoff)
+
+    assert archived == 0
+    response = await client.get("/api/tasks")
+    assert [t["is_done"] for t in response.json()] == [True]
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta, timezone
+import hashlib
+import multiprocessing
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("fcntl")
+
+from repository.token_cache import (
+    REVOKED,
+    CachedUser,
+    InsecureCacheFileError,
+    SharedTokenCache,
+)
+
+
+def _hash(value: str) -> bytes:
+    return hashlib.sha256(value.encode("utf-8")).digest()
+
+
+def _expires(seconds: int = 3600) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "token_cache")
+
+
+@pytest.fixture
+def shared_cache(cache_path, monkeypatch):
+    cache = SharedTokenCache(cache_path, 64, 60)
+    monkeypatch.setattr("repository.token_cache.token_cache", cache)
+    yield cache
+    cache.close()
+
+
+def _put_in_child(path: str) -> None:
+    cache = SharedTokenCache(path, 64, 60)
+    cache.put(_hash("child"), 7, "child", _expires())
+    cache.close()
+
+
+def test_entries_are_shared_between_mappings(cache_path):
+    writer = SharedTokenCache(cache_path, 64, 60)
+    reader = SharedTokenCache(cache_path, 64, 60)
+
+    writer.put(_hash("a"), 1, "alice", _expires())
+
+    assert reader.get(_hash("a")) == CachedUser(1, "alice")
+    reader.revoke(_hash("a"))
+    assert writer.get(_hash("a")) is REVOKED
+    writer.close()
+    reader.close()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs fork")
+def test_entries_are_shared_between_processes(cache_path):
+    cache = SharedTokenCache(cache_path, 64, 60)
+    process = multiprocessing.get_context("fork").Process(
+        target=_put_in_child, args=(cache_path,)
+    )
+    process.start()
+    process.join()
+
+    assert process.exitcode == 0
+    assert cache.get(_hash("child")) == CachedUser(7, "child")
+    cache.close()
+
+
+def test_revoked_token_is_not_put_back(cache_path):
+    cache = SharedTokenCache(cache_path, 64, 60)
+
+    cache.revoke(_hash("a"))
+    cache.put(_hash("a"), 1, "alice", _expires())
+
+    assert cache.get(_hash("a")) is REVOKED
+    cache.close()
+
+
+def test_expired_session_is_a_miss(cache_path):
+    cache = SharedTokenCache(cache_path, 64, 60)
+
+    cache.put(_hash("a"), 1, "alice", _expires(-1))
+
+    assert cache.get(_hash("a")) is None
+    cache.close()
+
+
+def test_full_table_evicts_entries_closest_to_expiry(cache_path):
+    cache = SharedTokenCache(cache_path, 8, 60)
+    for i in range(20):
+        cache.put(_hash(str(i)), i, f"user_{i}", _expires(i + 10))
+
+    assert cache.get(_hash("19")) == CachedUser(19, "user_19")
+    assert cache.get(_hash("0")) is None
+    cache.close()
+
+
+def test_file_open_to_other_users_is_rejected(cache_path):
+    with open(cache_path, "wb"):
+        pass
+    os.chmod(cache_path, 0o666)
+
+    with pytest.raises(InsecureCacheFileError):
+        SharedTokenCache(cache_path, 64, 60)
+
+
+def test_symlinked_file_is_rejected(cache_path, tmp_path):
+    target = tmp_path / "elsewhere"
+    target.write_bytes(b"")
+    os.symlink(target, cache_path)
+
+    with pytest.raises(OSError):
+        SharedTokenCache(cache_path, 64, 60)
+
+
+@pytest.mark.asyncio
+async def test_logout_invalidates_cached_token(client, login, shared_cache):
+    await login("cached")
+    first = await client.get("/api/me")
+    assert first.status_code == 200
+
+    token = client.cookies.get("auth_token")
+    assert shared_cache.get(_hash(token)) == CachedUser(
+        first.json()["id"], "cached"
+    )
+    await client.post("/api/logout")
+    client.cookies.set("auth_token", token)
+
+    response = await client.get("/api/me")
+
+    assert response.status_code == 401